@@ -0,0 +1,99 @@
+"""Compare common_nihlaeth.sum_actions against the old pairwise += fold:
+time to build and execute a spell command, and proxy round trips per
+command.
+
+    python benchmarks/action_sequence_cost.py [--length 80] [--commands 50]
+
+A spell command's value is one MappingRule value per character, each a
+Key bound to the recognition's extras. The reference folds them with
+result += action as sum_actions did, an ActionSeries that recomputes its
+description on every append and executes one proxy call per key. Both
+are executed against a StandinServer, which counts the RPCs received and
+the keys typed; both must type the same keys.
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import grammar_env
+from standin_server import StandinServer
+
+
+def reference_sum_actions(actions):
+    if len(actions) == 0:
+        return None
+    elif len(actions) == 1:
+        return actions[0]
+    result = actions[0]
+    for action in actions[1:]:
+        result += action
+    return result
+
+
+def spelled(server):
+    """Key names typed since the last reset, one per press."""
+    keys = []
+    for (_, method, params) in server.calls:
+        if method == 'key_press':
+            keys.extend([params['key']] * (params.get('count') or 1))
+    return keys
+
+
+def run(server, function, commands):
+    """(build seconds, execute seconds, rpcs, keys) for commands."""
+    server.reset()
+    start = time.time()
+    actions = [function(values) for values in commands]
+    built = time.time()
+    for action in actions:
+        action.execute()
+    executed = time.time()
+    return (built - start, executed - built, len(server.rpcs),
+            spelled(server))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--length', type=int, default=80)
+    parser.add_argument('--commands', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server = StandinServer(port=0)
+    server.start()
+    try:
+        grammar_env.setup(server.address)
+        import common_nihlaeth
+        from dragonfly.actions.action_base import BoundAction
+
+        rng = random.Random(args.seed)
+        characters = string.lowercase + string.digits
+        commands = [[BoundAction(common_nihlaeth.Key(rng.choice(characters)),
+                                 {})
+                     for _ in xrange(args.length)]
+                    for _ in xrange(args.commands)]
+        results = {}
+        for (label, function) in (
+                ('reference', reference_sum_actions),
+                ('sequence', common_nihlaeth.sum_actions)):
+            results[label] = run(server, function, commands)
+            (build, execute, rpcs, _) = results[label]
+            print '%-10s build %8.1f us  execute %8.1f ms  %5.1f rpcs' \
+                ' per command' % (
+                    label, 1e6 * build / args.commands,
+                    1e3 * execute / args.commands,
+                    float(rpcs) / args.commands)
+        if results['reference'][3] != results['sequence'][3]:
+            print 'MISMATCH: the commands typed different keys'
+            sys.exit(1)
+        print 'same %d keys typed by both' % len(results['sequence'][3])
+    finally:
+        server.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Latency of a context query behind a backlog of queued proxy actions.
+
+    python benchmarks/context_query_latency.py [--backlog 10] [--delay 0.005]
+
+ProxyAppContext calls get_context at the start of each utterance. With
+dispatch.AsyncProxy installed, the previous utterance's actions may still
+be queued then. This queues --backlog batches on an AsyncProxy over a
+server that takes --delay seconds per action, then times get_context,
+three ways: the old way (after the whole queue has drained), the way
+queries are answered behind plain typing (after at most the batch on the
+wire), and behind a queued alt-tab (after the alt-tab has been sent).
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'grammars'))
+
+import dispatch
+
+
+class SlowServer(object):
+
+    """Takes delay seconds per action, like xdotool typing."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def execute_batch(self, batch):
+        with self.lock:
+            time.sleep(self.delay * len(batch))
+
+    def get_context(self):
+        with self.lock:
+            return {'title': 'standin'}
+
+
+def query_latency(proxy, backlog, drain_first, switch_window):
+    for _ in xrange(backlog):
+        proxy.execute_batch([('key_press', (), {'key': 'a'})] * 5)
+    if switch_window:
+        proxy.execute_batch(
+            [('key_press', (), {'key': 'tab', 'modifiers': ['alt']})])
+    start = time.time()
+    if drain_first:
+        proxy.flush()
+    proxy.get_context()
+    elapsed = time.time() - start
+    proxy.flush()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--backlog', type=int, default=10)
+    parser.add_argument('--delay', type=float, default=0.005)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+    proxy = dispatch.AsyncProxy(SlowServer(args.delay))
+    for (label, drain_first, switch_window) in (
+            ('drain first', True, False),
+            ('no drain', False, False),
+            ('alt-tab', False, True)):
+        samples = [
+            query_latency(proxy, args.backlog, drain_first, switch_window)
+            for _ in xrange(args.runs)]
+        print '%-12s get_context %7.1f ms (median of %d)' % (
+            label, 1e3 * sorted(samples)[len(samples) // 2], args.runs)
+    proxy.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Check formatting.format_words against the old IdentifierInsertion.value
+and time both per call.
+
+    python benchmarks/formatter_cost.py [--calls 200000] [--seed 0]
+
+ReferenceIdentifier is how IdentifierInsertion.value formatted its words
+before the formatter registry: four passes over the words and a globals()
+lookup of the formatter on every call. Random recognitions over every
+registered style, with and without the upper/natural prefixes and with
+Dragon's "written\\spoken" and hyphenated words, must format identically
+with both.
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'grammars'))
+
+import formatting
+
+# Dictated phrases, as Dragon reports their words.
+DICTATIONS = [
+    ['read', 'table'],
+    ['hello', 'world'],
+    ['get\\get', 'value\\value'],
+    ['e-mail', 'address'],
+    ['HTTP\\H. T. T. P.', 'request', 'handler'],
+    ['x'],
+    ['number', 'of', 'rows', 'in', 'the', 'data', 'frame'],
+    ['Jan\\January', 'total'],
+    ]
+
+PREFIXES = [[], ['upper'], ['natural']]
+
+# Styles formatting words cased by the caller, as IdentifierInsertion
+# offers them.
+IDENTIFIER_STYLES = sorted(
+    spoken for spoken in formatting.FORMATTERS
+    if spoken not in ('snake-case', 'mixed-case', 'upper-score', 'dictate'))
+
+
+def reference_value(words):
+    uppercase = words[0] == 'upper'
+    lowercase = words[0] != 'natural'
+
+    if lowercase:
+        words = [word.lower() for word in words]
+    if uppercase:
+        words = [word.upper() for word in words]
+
+    words = [word.split('\\', 1)[0].replace('-', '') for word in words]
+    if words[0].lower() in ('upper', 'natural'):
+        del words[0]
+
+    function = vars(formatting)['format_%s' % words[0].lower()]
+    return function(words[1:])
+
+
+def corpus(count, seed):
+    generator = random.Random(seed)
+    return [generator.choice(PREFIXES) + [generator.choice(IDENTIFIER_STYLES)]
+            + generator.choice(DICTATIONS) for _ in xrange(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--calls', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    recognitions = corpus(args.calls, args.seed)
+    for words in recognitions[:10000]:
+        expected = reference_value(words)
+        got = formatting.format_words(words)
+        if got != expected:
+            print 'MISMATCH for %r: %r != %r' % (words, got, expected)
+            sys.exit(1)
+    print 'identical output for %d recognitions' % min(10000, args.calls)
+
+    for (label, function) in (('reference', reference_value),
+                              ('registry', formatting.format_words)):
+        seconds = min(timeit.repeat(
+            lambda: [function(words) for words in recognitions],
+            number=1, repeat=3))
+        print '%-10s %6.2f us/call' % (label, 1e6 * seconds / args.calls)
+
+if __name__ == '__main__':
+    main()
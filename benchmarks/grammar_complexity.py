@@ -0,0 +1,349 @@
+"""Static complexity report for the grammar modules, with CI thresholds.
+
+    python benchmarks/grammar_complexity.py [--module _vim] [--json]
+        [--max-expanded N] [--max-depth N] [--max-repeated-dictations N]
+
+Loads each module on dragonfly's text engine (see grammar_env) and walks
+the element tree of every rule in its grammars. Per rule it reports:
+
+    nodes      elements in the rule's own tree
+    compiled   estimated bytes of the rule in a compiled Natlink grammar:
+               its own tree with each Repetition unrolled, since that is
+               how dragonfly compiles them
+    expanded   elements with every RuleRef inlined as well; a measure of
+               the search space Dragon sees behind the rule
+    depth      deepest nesting, following RuleRefs
+    dictation  Dictation elements reachable from the rule, and how many of
+               them sit under a Repetition and so are repeated
+
+For each Repetition it shows the blow-up (copies x expanded size of the
+child) and, when one alternative dominates it or brings in free
+dictation, suggests moving that alternative into a grammar or top-level
+rule of its own.
+
+Exits with status 1 if an exported rule exceeds a threshold given on the
+command line, so CI can guard against grammars Dragon would find too
+complex. There are no default thresholds yet: pick them from this
+script's output on the real grammars.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'grammars'))
+
+import grammar_env
+from standin_server import StandinServer
+
+MODULES = ['_rstudio', '_vim', 'catchall', 'vim2', 'test', 'global_nilhaeth']
+
+# Default CI thresholds for exported rules; None checks nothing. Not set
+# until they have been checked against a run on the real grammars.
+MAX_EXPANDED = None
+MAX_DEPTH = None
+MAX_REPEATED_DICTATIONS = None
+
+# Rough sizes for the compiled estimate: per element, and per word on top
+# of its characters.
+ELEMENT_BYTES = 8
+WORD_BYTES = 8
+
+# An alternative under a Repetition taking more than this share of the
+# child's expanded size is suggested for splitting out.
+DOMINANT_SHARE = 0.5
+
+
+def repetition_copies(element):
+    """How many times a Repetition's child is unrolled; dragonfly's max is
+    exclusive."""
+    return max(element.max - 1, element.min, 1)
+
+
+def is_repetition(element):
+    from dragonfly import Repetition
+    return isinstance(element, Repetition)
+
+
+def is_dictation(element):
+    from dragonfly import Dictation
+    return isinstance(element, Dictation)
+
+
+def referenced_rule(element):
+    from dragonfly import RuleRef
+    if isinstance(element, RuleRef):
+        return element.rule
+    return None
+
+
+def repetition_child(element):
+    return element._child
+
+
+def literal_words(element):
+    # Not getattr: Dictation answers any attribute with a formatting call.
+    from dragonfly import Literal
+    if isinstance(element, Literal):
+        return element.words
+    return []
+
+
+class Analyzer(object):
+
+    """Memoised walks over dragonfly element trees."""
+
+    def __init__(self):
+        self._expanded = {}
+        self._depth = {}
+        self._dictations = {}
+
+    def own(self, element):
+        """(nodes, compiled bytes) of element without following RuleRefs."""
+        if referenced_rule(element) is not None:
+            return 1, ELEMENT_BYTES
+        nodes = 1
+        size = ELEMENT_BYTES + sum(len(word) + WORD_BYTES
+                                   for word in literal_words(element))
+        if is_repetition(element):
+            child_nodes, child_size = self.own(repetition_child(element))
+            copies = repetition_copies(element)
+            return nodes + child_nodes, size + copies * child_size
+        for child in element.children:
+            child_nodes, child_size = self.own(child)
+            nodes += child_nodes
+            size += child_size
+        return nodes, size
+
+    def expanded(self, element, active=()):
+        """Elements in the tree with RuleRefs inlined and Repetitions
+        unrolled. Recursive references count once."""
+        rule = referenced_rule(element)
+        if rule is not None:
+            if rule in active:
+                return 1
+            if rule not in self._expanded:
+                self._expanded[rule] = 1 + self.expanded(
+                    rule.element, active + (rule,))
+            return self._expanded[rule]
+        if is_repetition(element):
+            return 1 + repetition_copies(element) * self.expanded(
+                repetition_child(element), active)
+        return 1 + sum(self.expanded(child, active)
+                       for child in element.children)
+
+    def depth(self, element, active=()):
+        rule = referenced_rule(element)
+        if rule is not None:
+            if rule in active:
+                return 1
+            if rule not in self._depth:
+                self._depth[rule] = 1 + self.depth(
+                    rule.element, active + (rule,))
+            return self._depth[rule]
+        children = element.children
+        if is_repetition(element):
+            children = [repetition_child(element)]
+        return 1 + max([self.depth(child, active) for child in children]
+                       or [0])
+
+    def dictations(self, element, path=(), repeated=False, active=()):
+        """[(path, repeated)] for every Dictation reachable from element;
+        path is the chain of rule and element names leading to it."""
+        found = []
+        name = getattr(element, 'name', None)
+        rule = referenced_rule(element)
+        if rule is not None:
+            if rule in active:
+                return found
+            return self.dictations(rule.element, path + (rule.name,),
+                                   repeated, active + (rule,))
+        if is_dictation(element):
+            return [(path + (name or 'Dictation',), repeated)]
+        children = element.children
+        if is_repetition(element):
+            # Its children are the unrolled copies; walk the child once.
+            repeated = True
+            children = [repetition_child(element)]
+        for child in children:
+            found.extend(self.dictations(child, path, repeated, active))
+        return found
+
+    def repetitions(self, element, path=(), active=()):
+        """Every Repetition reachable from element, as dicts describing its
+        blow-up and, where it applies, a suggested split."""
+        found = []
+        rule = referenced_rule(element)
+        if rule is not None:
+            if rule in active:
+                return found
+            return self.repetitions(rule.element, path + (rule.name,),
+                                    active + (rule,))
+        if is_repetition(element):
+            child = repetition_child(element)
+            copies = repetition_copies(element)
+            child_size = self.expanded(child)
+            found.append({
+                'path': '/'.join(path + (element.name or 'Repetition',)),
+                'copies': copies,
+                'child_expanded': child_size,
+                'blowup': copies * child_size,
+                'suggestions': self.suggestions(child, child_size),
+                })
+            return found + self.repetitions(child, path, active)
+        for child in element.children:
+            found.extend(self.repetitions(child, path, active))
+        return found
+
+    def suggestions(self, child, child_size):
+        """Alternatives under a Repetition worth moving out of it."""
+        alternatives = child.children if child.children else (child,)
+        suggestions = []
+        for alternative in alternatives:
+            rule = referenced_rule(alternative)
+            label = rule.name if rule is not None else (
+                alternative.name or type(alternative).__name__)
+            size = self.expanded(alternative)
+            free = [path for (path, _) in self.dictations(alternative)]
+            if free:
+                suggestions.append(
+                    '%s brings in dictation via %s; give it its own '
+                    'top-level rule so it is not repeated' % (
+                        label, ', '.join('/'.join(path) for path in free)))
+            elif child_size and float(size) / child_size > DOMINANT_SHARE:
+                suggestions.append(
+                    '%s is %d%% of the repeated child; consider a '
+                    'separate grammar for it' % (
+                        label, 100 * size // child_size))
+        return suggestions
+
+    def rule_report(self, rule):
+        nodes, compiled = self.own(rule.element)
+        dictations = self.dictations(rule.element, (rule.name,))
+        return {
+            'rule': rule.name,
+            'exported': bool(rule.exported),
+            'nodes': nodes,
+            'compiled': compiled,
+            'expanded': self.expanded(rule.element, (rule,)),
+            'depth': self.depth(rule.element, (rule,)),
+            'dictations': len(dictations),
+            'repeated_dictations': sum(1 for (_, repeated) in dictations
+                                       if repeated),
+            'dictation_paths': ['/'.join(path) for (path, _) in dictations],
+            'repetitions': self.repetitions(rule.element, (rule.name,),
+                                            (rule,)),
+            }
+
+
+def compiled_size(grammar):
+    """Exact compiled size of grammar from dragonfly's Natlink compiler, or
+    None where it is not available."""
+    try:
+        from dragonfly.engines.backend_natlink.compiler import NatlinkCompiler
+        compiled, _ = NatlinkCompiler().compile_grammar(grammar)
+    except Exception:
+        return None
+    return len(compiled)
+
+
+def analyze_module(engine, name):
+    """Reports for every grammar module name registers."""
+    before = set(engine.grammars)
+    module = grammar_env.load(name)
+    grammars = [grammar for grammar in engine.grammars
+                if grammar not in before]
+    analyzer = Analyzer()
+    try:
+        return [{
+            'module': name,
+            'grammar': grammar.name,
+            'compiled': compiled_size(grammar),
+            'rules': [analyzer.rule_report(rule) for rule in grammar.rules],
+            } for grammar in grammars]
+    finally:
+        grammar_env.unload(module)
+        for grammar in grammars:
+            if grammar.loaded:
+                grammar.unload()
+
+
+def violations(report, max_expanded, max_depth, max_repeated_dictations):
+    found = []
+    for rule in report['rules']:
+        if not rule['exported']:
+            continue
+        where = '%s:%s.%s' % (report['module'], report['grammar'],
+                              rule['rule'])
+        if max_expanded is not None and rule['expanded'] > max_expanded:
+            found.append('%s expands to %d elements (limit %d)' % (
+                where, rule['expanded'], max_expanded))
+        if max_depth is not None and rule['depth'] > max_depth:
+            found.append('%s nests %d deep (limit %d)' % (
+                where, rule['depth'], max_depth))
+        if (max_repeated_dictations is not None and
+                rule['repeated_dictations'] > max_repeated_dictations):
+            found.append('%s repeats %d dictations (limit %d)' % (
+                where, rule['repeated_dictations'], max_repeated_dictations))
+    return found
+
+
+def print_report(report):
+    compiled = report['compiled']
+    print '%s: grammar %r%s' % (
+        report['module'], report['grammar'],
+        ', %d bytes compiled' % compiled if compiled is not None else '')
+    for rule in sorted(report['rules'], key=lambda rule: -rule['expanded']):
+        print ('  %-32s %s nodes %5d  compiled ~%7d B  expanded %9d  '
+               'depth %3d  dictation %d (%d repeated)' % (
+                   rule['rule'], 'E' if rule['exported'] else ' ',
+                   rule['nodes'], rule['compiled'], rule['expanded'],
+                   rule['depth'], rule['dictations'],
+                   rule['repeated_dictations']))
+        if not rule['exported']:
+            continue
+        for repetition in rule['repetitions']:
+            print '      repetition %s: %d x %d = %d' % (
+                repetition['path'], repetition['copies'],
+                repetition['child_expanded'], repetition['blowup'])
+            for suggestion in repetition['suggestions']:
+                print '        suggest: %s' % suggestion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--module', action='append', choices=MODULES,
+                        help='module to analyze (default: all)')
+    parser.add_argument('--json', action='store_true',
+                        help='print the reports as JSON')
+    parser.add_argument('--max-expanded', type=int, default=MAX_EXPANDED)
+    parser.add_argument('--max-depth', type=int, default=MAX_DEPTH)
+    parser.add_argument('--max-repeated-dictations', type=int,
+                        default=MAX_REPEATED_DICTATIONS)
+    args = parser.parse_args()
+
+    server = StandinServer(port=0)
+    server.start()
+    engine = grammar_env.setup(server.address)
+    reports = []
+    try:
+        for name in args.module or MODULES:
+            reports.extend(analyze_module(engine, name))
+    finally:
+        server.stop()
+
+    if args.json:
+        print json.dumps(reports, indent=2)
+    else:
+        for report in reports:
+            print_report(report)
+    failed = []
+    for report in reports:
+        failed.extend(violations(report, args.max_expanded, args.max_depth,
+                                 args.max_repeated_dictations))
+    for violation in failed:
+        print >> sys.stderr, 'too complex: %s' % violation
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
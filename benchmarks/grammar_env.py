@@ -0,0 +1,162 @@
+"""Load the grammars in grammars/ outside Natlink.
+
+Needs dragonfly (dragonfly2, for its text engine) and the aenea client
+package installed; Natlink and Dragon are not needed. setup() selects the
+text engine before any grammar is imported, so Grammar.load() registers
+with it and engine.mimic() runs recognitions through the real rule
+callbacks. Proxy actions go to whatever server address is given, normally
+a StandinServer.
+
+Where Natlink itself is missing, setup() puts in an OfflineNatlink that
+only records microphone state changes, so grammars that import
+natlink.setMicState (test.py) still load.
+"""
+import importlib
+import os
+import re
+import sys
+
+GRAMMAR_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', 'grammars'))
+
+# Spoken values used for <extras> when expanding a spec into a phrase.
+EXTRA_WORDS = {
+    'count': 'three',
+    'n': 'three',
+    'number': 'twenty five',
+    'text': 'hello world',
+    'text2': 'goodbye',
+    'dictation': 'hello world',
+    'LetterMapping': 'alpha',
+    }
+
+# Modules imported under a name other than their file's.
+# global_nilhaeth.py imports its helpers as "common".
+MODULE_ALIASES = {
+    'common': 'common_nihlaeth',
+    }
+
+# Modules that register their grammar from a load() function rather than
+# at import time.
+LOAD_FUNCTIONS = frozenset(['global_nilhaeth'])
+
+
+class OfflineNatlink(object):
+
+    """Stands in for the natlink module outside Dragon."""
+
+    __name__ = 'natlink'
+
+    def __init__(self):
+        self.mic_state = 'on'
+
+    def setMicState(self, state):
+        self.mic_state = state
+
+    def getMicState(self):
+        return self.mic_state
+
+
+def setup(server_address=None):
+    """Select dragonfly's text engine and point aenea at server_address.
+    Returns the engine."""
+    if GRAMMAR_DIR not in sys.path:
+        sys.path.insert(0, GRAMMAR_DIR)
+    try:
+        import natlink
+    except ImportError:
+        sys.modules['natlink'] = OfflineNatlink()
+    import dragonfly
+    engine = dragonfly.get_engine('text')
+    import aenea.config
+    aenea.config.PLATFORM = 'proxy'
+    if server_address is not None:
+        aenea.config.DEFAULT_SERVER_ADDRESS = tuple(server_address)
+    return engine
+
+
+def load(name, settle=True):
+    """Import (and so load) the grammar module name, e.g. '_rstudio'. With
+    settle, grammars deferred to the next utterance are loaded too."""
+    for (alias, real) in MODULE_ALIASES.iteritems():
+        if alias not in sys.modules:
+            try:
+                sys.modules[alias] = importlib.import_module(real)
+            except ImportError:
+                pass
+    module = importlib.import_module(name)
+    if name in LOAD_FUNCTIONS:
+        module.load()
+    if settle:
+        load_deferred()
+    return module
+
+
+def load_deferred():
+    """Load what the grammars leave to the start of the next utterance, as
+    Natlink's first utterance after loading the modules would; that is
+    vim_core's shared grammar."""
+    if 'vim_core' in sys.modules:
+        sys.modules['vim_core'].load_pending()
+
+
+def unload(module):
+    if hasattr(module, 'unload'):
+        module.unload()
+    sys.modules.pop(module.__name__, None)
+
+
+_TOKEN = re.compile(r'\s*(<[^>]+>|[()\[\]|]|[^\s()\[\]|<]+)')
+
+
+def example_phrase(spec, extras=EXTRA_WORDS):
+    """
+    Expand a dragonfly spec into one phrase that matches it.
+
+    The first alternative of every group is taken and optional parts are
+    left out. Returns None if the spec references an extra with no entry
+    in extras.
+    """
+    tokens = _TOKEN.findall(spec)
+    position = [0]
+
+    def sequence():
+        words = []
+        while position[0] < len(tokens):
+            token = tokens[position[0]]
+            if token in (')', ']', '|'):
+                break
+            position[0] += 1
+            if token == '(':
+                words.extend(alternatives(')'))
+            elif token == '[':
+                alternatives(']')
+            elif token.startswith('<'):
+                words.append(extras.get(token[1:-1]))
+            else:
+                words.append(token)
+        return words
+
+    def alternatives(close):
+        first = sequence()
+        while position[0] < len(tokens) and tokens[position[0]] == '|':
+            position[0] += 1
+            sequence()
+        position[0] += 1  # close
+        return first
+
+    words = sequence()
+    if None in words:
+        return None
+    return ' '.join(words)
+
+
+def mapping_phrases(mapping, extras=EXTRA_WORDS):
+    """[(spec, phrase)] for every spec of a MappingRule mapping that
+    example_phrase can expand."""
+    phrases = []
+    for spec in sorted(mapping):
+        phrase = example_phrase(spec, extras)
+        if phrase:
+            phrases.append((spec, phrase))
+    return phrases
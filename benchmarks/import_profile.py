@@ -0,0 +1,303 @@
+"""Import-time profile of the grammar modules, with per-module budgets.
+
+    python benchmarks/import_profile.py [--module _rstudio] [--natlink]
+        [--budget _rstudio=400] [--strict] [--json]
+
+Imports the grammar modules the way Natlink does, one after another in one
+process, on dragonfly's text engine (see grammar_env). Every import made
+along the way, including helpers such as vim_core, aenea.misc or
+action_compiler, is timed through a hook on __import__, and for each
+module the report gives:
+
+    self       time spent in the module's own top-level code
+    total      self plus the modules it imported first
+    objects    gc-tracked objects it left behind (self)
+    rss        growth of the resident set while it ran (total), where the
+               platform reports it
+
+ranked by self time. Calls that are known to be expensive at import
+(make_grammar_commands, vocabulary registration) are counted and timed
+separately and shown under the module that made them. The shared vim
+grammar, which vim_core builds at the first utterance, shows as
+"first utterance".
+
+--natlink loads every _-prefixed module in grammars/, in the order Natlink
+would. Each module may have a budget in milliseconds of total time
+(BUDGETS, or --budget NAME=MS); a module over its budget is reported on
+stderr, and with --strict the exit status is 1.
+"""
+import __builtin__
+import argparse
+import collections
+import contextlib
+import gc
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'grammars'))
+
+import grammar_env
+from standin_server import StandinServer
+
+MODULES = ['_rstudio', '_vim', '_latency', 'catchall', 'vim2', 'test',
+           'global_nilhaeth']
+
+# Milliseconds of total import time allowed per module. Empty until the
+# budgets have been checked against a run on the real grammars; give them
+# with --budget meanwhile.
+BUDGETS = {}
+
+# Functions timed on their own, as (module, attribute).
+WATCHED_CALLS = [
+    ('aenea.configuration', 'make_grammar_commands'),
+    ('configuration', 'make_grammar_commands'),
+    ('aenea.vocabulary', 'register_dynamic_vocabulary'),
+    ('aenea.vocabulary', 'register_global_dynamic_vocabulary'),
+    ('aenea.vocabulary', 'register_list_of_dynamic_vocabularies'),
+    ('aenea.vocabulary', 'get_static_vocabulary'),
+    ('aenea.vocabulary', 'inhibit_global_dynamic_vocabulary'),
+    ('action_compiler', 'compile_mapping'),
+    ]
+
+# Rows shown in the ranked report.
+TOP = 30
+
+
+def resident_bytes():
+    """Resident set size of this process, or None where /proc is not
+    available."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError):
+        return None
+
+
+class Record(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.total = 0.0
+        self.self_time = 0.0
+        self.objects = 0
+        self.rss = None
+        self.calls = collections.defaultdict(lambda: [0, 0.0])
+
+    def as_dict(self):
+        return {
+            'module': self.name,
+            'total': self.total,
+            'self': self.self_time,
+            'objects': self.objects,
+            'rss': self.rss,
+            'calls': dict(self.calls),
+            }
+
+
+class ImportProfiler(object):
+
+    """
+    Times every first import of a module while installed.
+
+    Parameters
+    ----------
+    clock: callable
+        time source, in seconds
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.records = {}
+        self._running = []
+        self._import = None
+        self._unwatch = []
+
+    def install(self):
+        self._import = __builtin__.__import__
+        __builtin__.__import__ = self._profiled_import
+        for (module_name, attribute) in WATCHED_CALLS:
+            if module_name in sys.modules:
+                self.watch(sys.modules[module_name], attribute)
+
+    def uninstall(self):
+        __builtin__.__import__ = self._import
+        for (module, attribute, original) in self._unwatch:
+            setattr(module, attribute, original)
+        del self._unwatch[:]
+
+    def running(self):
+        """Record of the module whose code is running, if any."""
+        return self._running[-1][0] if self._running else None
+
+    @contextlib.contextmanager
+    def measure(self, name):
+        """Time the block as (part of) the loading of name."""
+        record = self.records.setdefault(name, Record(name))
+        frame = {'children': 0.0, 'child_objects': 0}
+        self._running.append((record, frame))
+        objects = len(gc.get_objects())
+        rss = resident_bytes()
+        start = self.clock()
+        try:
+            yield record
+        finally:
+            elapsed = self.clock() - start
+            created = len(gc.get_objects()) - objects
+            self._running.pop()
+            record.total += elapsed
+            record.self_time += elapsed - frame['children']
+            record.objects += created - frame['child_objects']
+            if rss is not None:
+                record.rss = (record.rss or 0) + resident_bytes() - rss
+            if self._running:
+                parent = self._running[-1][1]
+                parent['children'] += elapsed
+                parent['child_objects'] += created
+
+    def _profiled_import(self, name, globals=None, locals=None,
+                         fromlist=None, level=-1):
+        if name in sys.modules or name in self.records:
+            return self._import(name, globals, locals, fromlist, level)
+        before = set(sys.modules)
+        try:
+            with self.measure(name):
+                return self._import(name, globals, locals, fromlist, level)
+        finally:
+            self._settle(name, set(sys.modules) - before)
+
+    def _settle(self, name, new):
+        """Name the record after the module the import created, or drop it
+        if it created none (an implicit relative import of a module that
+        was already loaded, or a failed import)."""
+        record = self.records.pop(name)
+        if name not in new:
+            matches = sorted(module for module in new
+                             if module.endswith('.' + name))
+            if not matches:
+                return
+            name = record.name = matches[0]
+        self.records[name] = record
+        for (module_name, attribute) in WATCHED_CALLS:
+            if module_name in new:
+                self.watch(sys.modules[module_name], attribute)
+
+    def watch(self, module, attribute):
+        """Time calls of module.attribute and charge them to the module
+        whose code makes them."""
+        original = getattr(module, attribute, None)
+        if original is None or getattr(original, 'watched', False):
+            return
+        profiler = self
+
+        def watched(*args, **kwargs):
+            record = profiler.running()
+            start = profiler.clock()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                if record is not None:
+                    call = record.calls[attribute]
+                    call[0] += 1
+                    call[1] += profiler.clock() - start
+        watched.watched = True
+        setattr(module, attribute, watched)
+        self._unwatch.append((module, attribute, original))
+
+    def ranked(self):
+        return sorted(self.records.values(),
+                      key=lambda record: -record.self_time)
+
+
+def natlink_modules():
+    """The modules Natlink loads from grammars/, in its order."""
+    return sorted(name[:-3] for name in os.listdir(grammar_env.GRAMMAR_DIR)
+                  if name.startswith('_') and name.endswith('.py')
+                  and not name.startswith('__'))
+
+
+def profile(modules):
+    """Load modules under an ImportProfiler; returns it."""
+    profiler = ImportProfiler()
+    profiler.install()
+    try:
+        for name in modules:
+            with profiler.measure(name):
+                grammar_env.load(name, settle=False)
+        with profiler.measure('first utterance'):
+            grammar_env.load_deferred()
+    finally:
+        profiler.uninstall()
+    return profiler
+
+
+def over_budget(profiler, budgets):
+    """[(module, total ms, budget ms)] for modules over their budget."""
+    found = []
+    for (name, budget) in sorted(budgets.iteritems()):
+        record = profiler.records.get(name)
+        if record is not None and 1e3 * record.total > budget:
+            found.append((name, 1e3 * record.total, budget))
+    return found
+
+
+def print_report(profiler, top=TOP):
+    print '%-32s %9s %9s %9s %9s' % ('module', 'self ms', 'total ms',
+                                     'objects', 'rss KiB')
+    for record in profiler.ranked()[:top]:
+        print '%-32s %9.1f %9.1f %9d %9s' % (
+            record.name, 1e3 * record.self_time, 1e3 * record.total,
+            record.objects,
+            '%d' % (record.rss // 1024) if record.rss is not None else '-')
+        for (call, (count, seconds)) in sorted(record.calls.iteritems()):
+            print '    %-28s %9.1f ms in %d calls' % (call, 1e3 * seconds,
+                                                      count)
+
+
+def parse_budget(value):
+    (name, milliseconds) = value.split('=', 1)
+    return name, float(milliseconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--module', action='append',
+                        help='module to load (default: %s)' % ', '.join(
+                            MODULES))
+    parser.add_argument('--natlink', action='store_true',
+                        help='load the _-prefixed modules, as Natlink does')
+    parser.add_argument('--budget', action='append', type=parse_budget,
+                        default=[], metavar='NAME=MS',
+                        help='total import time allowed for a module')
+    parser.add_argument('--strict', action='store_true',
+                        help='exit with status 1 if a module is over budget')
+    parser.add_argument('--json', action='store_true',
+                        help='print the records as JSON')
+    args = parser.parse_args()
+    modules = args.module or (natlink_modules() if args.natlink
+                              else MODULES)
+    budgets = dict(BUDGETS)
+    budgets.update(args.budget)
+
+    server = StandinServer(port=0)
+    server.start()
+    try:
+        grammar_env.setup(server.address)
+        profiler = profile(modules)
+    finally:
+        server.stop()
+
+    if args.json:
+        print json.dumps([record.as_dict() for record in profiler.ranked()],
+                         indent=2)
+    else:
+        print_report(profiler)
+    over = over_budget(profiler, budgets)
+    for (name, total, budget) in over:
+        print >> sys.stderr, 'over budget: %s imported in %.1fms ' \
+            '(budget %.0fms)' % (name, total, budget)
+    sys.exit(1 if over and args.strict else 0)
+
+if __name__ == '__main__':
+    main()
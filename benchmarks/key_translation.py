@@ -0,0 +1,42 @@
+"""Time aenea_client.KeyTranslator against the original send_key logic per
+event.
+
+    python benchmarks/key_translation.py [--events 1000000]
+
+ReferenceTranslator is the state machine AeneaClient.send_key ran before
+translation was precompiled; tests/test_key_translation.py checks that both
+give the same results.
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'grammars'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tests'))
+
+import aenea_client
+from test_key_translation import ReferenceTranslator
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--events', type=int, default=1000000)
+    args = parser.parse_args()
+    # Dictation: text keys with the odd BackSpace, no alt sequences.
+    events = [(key, key) for key in list('the quick brown fox') +
+              ['space', 'BackSpace', 'Shift_L']]
+    events = (events * (args.events // len(events) + 1))[:args.events]
+    for (label, translator) in (
+            ('reference', ReferenceTranslator()),
+            ('compiled', aenea_client.KeyTranslator())):
+        translate = translator.translate
+
+        def run():
+            for (char, key) in events:
+                translate(char, key)
+        seconds = min(timeit.repeat(run, number=1, repeat=3))
+        print '%-9s %6.1f ns/event' % (label, 1e9 * seconds / len(events))
+
+if __name__ == '__main__':
+    main()
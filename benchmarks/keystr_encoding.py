@@ -0,0 +1,101 @@
+"""Check common_nihlaeth.text_to_keystr against the original per-call
+translation and time both per call.
+
+    python benchmarks/keystr_encoding.py [--calls 200000] [--seed 0]
+
+reference_keystr is text_to_keystr before its table was built at import:
+the key name dict rebuilt on every call and one key per character.
+Random ASCII texts must give the same keys from both once the new
+counts ('a:3') are expanded. Texts with characters the reference could
+not type must encode without raising.
+
+Two workloads are timed: repeated dictation (what Text sees, mostly
+cache hits) and distinct texts (every call a cache miss).
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'grammars'))
+
+import common_nihlaeth
+
+# Typed by Text.
+PHRASES = [
+    'hello world',
+    'read_table(x, header = TRUE)',
+    'HTTPRequestHandler',
+    'if (a == b) {\n\treturn 0;\n}',
+    'aaa   bbb',
+    '#!/usr/bin/env python\n',
+    "'quoted' \"words\"",
+    ]
+
+# Characters the reference raised KeyError on.
+UNTYPABLE = [u'caf\xe9', u'\u2014', 'bell\x07', 'line\r\nbreak']
+
+
+def reference_keystr(text):
+    if text is None:
+        return None
+    charnames = dict(common_nihlaeth.KEY_NAMES)
+    del charnames['\r']
+    charnames['\r\n'] = 'enter'
+    for character in string.lowercase + string.digits:
+        charnames[character] = character
+    for character in string.uppercase:
+        charnames[character] = 's-{}'.format(character)
+    return ','.join(
+        [charnames[character] for character in str(text)])
+
+
+def expand(keystr):
+    keys = []
+    for key in keystr.split(',') if keystr else []:
+        (name, _, count) = key.partition(':')
+        keys.extend([name] * int(count or 1))
+    return ','.join(keys)
+
+
+def check(rng, count=20000):
+    alphabet = [character for character in common_nihlaeth.KEY_NAMES
+                if character != '\r']
+    for _ in xrange(count):
+        text = ''.join(rng.choice(alphabet)
+                       for _ in xrange(rng.randint(0, 40)))
+        expected = reference_keystr(text)
+        actual = expand(common_nihlaeth.text_to_keystr(text))
+        if actual != expected:
+            raise AssertionError('%r -> %r, expected %r' % (
+                text, actual, expected))
+    for text in UNTYPABLE:
+        print '%-20r -> %s' % (text, common_nihlaeth.text_to_keystr(text))
+    print 'ok: %d random texts match' % count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--calls', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    check(rng)
+
+    dictation = [rng.choice(PHRASES) for _ in xrange(args.calls)]
+    distinct = ['%s %d' % (rng.choice(PHRASES), index)
+                for index in xrange(args.calls)]
+    for (workload, texts) in (('dictation', dictation),
+                              ('distinct', distinct)):
+        for (label, function) in (('reference', reference_keystr),
+                                  ('compiled', common_nihlaeth.text_to_keystr)):
+            seconds = min(timeit.repeat(
+                lambda: [function(text) for text in texts],
+                number=1, repeat=3))
+            print '%-10s %-10s %6.2f us/call' % (
+                workload, label, 1e6 * seconds / len(texts))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Push synthetic keys through aenea_client.ProxyBuffer.send_key.
+
+    python benchmarks/proxy_buffer_throughput.py [--keys 1000000]
+
+The server is replaced by a sink that only counts what it receives, so this
+measures the buffer itself: how fast the capture thread can hand off keys
+and how long the worker takes to drain them. Exits with status 1 if any
+batch held more than the buffer's max_batch keys.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'grammars'))
+
+import aenea.communications
+import aenea_client
+
+
+class CountingSink(object):
+
+    def __init__(self):
+        self.batches = 0
+        self.commands = 0
+
+    def execute_batch(self, batch):
+        self.batches += 1
+        self.commands += len(batch)
+
+
+# Mostly text with the odd control key, like dictation into the capture box.
+PATTERN = list('the quick brown fox ') + ['BackSpace', 'BackSpace'] + \
+    list('jumps over the lazy dog. ') + ['Return']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--keys', type=int, default=1000000)
+    parser.add_argument('--window', type=float,
+                        default=aenea_client.COALESCE_WINDOW)
+    args = parser.parse_args()
+
+    sink = CountingSink()
+    aenea.communications.server = sink
+    buffer = aenea_client.ProxyBuffer(window=args.window)
+    keys = (PATTERN * (args.keys // len(PATTERN) + 1))[:args.keys]
+
+    start = time.time()
+    for key in keys:
+        buffer.send_key(key)
+    produced = time.time() - start
+    buffer.flush()
+    drained = time.time() - start
+
+    print '%d keys: send_key %.0f keys/s, drained in %.2fs (%.0f keys/s)' % (
+        args.keys, args.keys / produced, drained, args.keys / drained)
+    print '%d batches, %d commands; %s' % (
+        sink.batches, sink.commands, buffer.metrics.summary())
+    buffer.close()
+    if buffer.metrics.max_keys > buffer.max_batch:
+        print >> sys.stderr, 'a batch held %d keys, over max_batch %d' % (
+            buffer.metrics.max_keys, buffer.max_batch)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""Recognition-side CPU cost of the grammars, per utterance and per rule.
+
+    python benchmarks/recognition_harness.py [--corpus FILE] [--runs 20]
+                                             [--module _rstudio] [--rules]
+
+Loads each grammar module named in the corpus (_rstudio, _vim, catchall,
+test, global_nilhaeth) on dragonfly's text engine, one module at a time,
+and mimics its utterances. Actions go through the usual dispatch queue to
+a StandinServer, so the time measured is what Natlink would spend in the
+grammar: decoding the words against the rules plus building the value
+(process_recognition), not typing.
+
+For every utterance it reports the p50/p95 of the whole mimic and of the
+top-level rule's process_recognition; --rules adds the inclusive time
+spent in value() of every rule, nested ones included. Utterances the
+grammar does not accept are listed so the corpus stays honest.
+"""
+import argparse
+import collections
+import os
+import sys
+import time
+import traceback
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'grammars'))
+
+import grammar_env
+from standin_server import StandinServer
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__),
+                              'recognition_corpus.txt')
+
+# Window title reported to each module's proxy context; modules not
+# listed get DEFAULT_TITLE.
+DEFAULT_TITLE = 'Rstudio - mike@eohippus'
+MODULE_TITLES = {
+    'catchall': 'LibreOffice Writer',
+    }
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def read_corpus(path):
+    """[(module, utterance)] in file order."""
+    corpus = []
+    with open(path) as lines:
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            module, _, words = line.partition(':')
+            corpus.append((module.strip(), words.strip()))
+    return corpus
+
+
+class RuleTimer(object):
+
+    """
+    Wraps process_recognition and value() on the rules of some grammars
+    and collects how long each call took, by rule name.
+    """
+
+    def __init__(self):
+        self.recognition = collections.defaultdict(list)
+        self.value = collections.defaultdict(list)
+        self._wrapped = []
+
+    def instrument(self, grammars):
+        for grammar in grammars:
+            for rule in grammar.rules:
+                self._wrap(rule, 'process_recognition', self.recognition)
+                if hasattr(rule, 'value'):
+                    self._wrap(rule, 'value', self.value)
+
+    def _wrap(self, rule, attribute, samples):
+        original = getattr(rule, attribute)
+        name = rule.name
+
+        def timed(*args, **kwargs):
+            start = time.time()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                samples[name].append(time.time() - start)
+        setattr(rule, attribute, timed)
+        self._wrapped.append((rule, attribute))
+
+    def take_recognition(self):
+        """Samples recorded since the last call, as {rule: [seconds]}."""
+        taken = dict(self.recognition)
+        self.recognition.clear()
+        return taken
+
+    def restore(self):
+        for (rule, attribute) in self._wrapped:
+            delattr(rule, attribute)
+        self._wrapped = []
+
+
+def run_module(engine, name, utterances, runs, timer):
+    """Mimic each utterance runs times; returns [(utterance, rule, mimic
+    samples, process_recognition samples)] and the rejected utterances."""
+    import dispatch
+    from dragonfly import MimicFailure
+
+    before = set(engine.grammars)
+    module = grammar_env.load(name)
+    grammars = [grammar for grammar in engine.grammars
+                if grammar not in before]
+    timer.instrument(grammars)
+    results, rejected = [], []
+    try:
+        for utterance in utterances:
+            words = utterance.split()
+            mimic, recognition, rule = [], [], None
+            try:
+                for _ in xrange(runs):
+                    start = time.time()
+                    engine.mimic(words)
+                    mimic.append(time.time() - start)
+                    for (rule, samples) in timer.take_recognition().items():
+                        recognition.extend(samples)
+                    dispatch.flush()
+            except MimicFailure:
+                rejected.append(utterance)
+                continue
+            results.append((utterance, rule, mimic, recognition))
+    finally:
+        timer.restore()
+        grammar_env.unload(module)
+        # Some modules' unload() leave grammars registered.
+        for grammar in grammars:
+            if grammar.loaded:
+                grammar.unload()
+    return results, rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    parser.add_argument('--runs', type=int, default=20,
+                        help='mimics per utterance')
+    parser.add_argument('--module', action='append',
+                        help='only run utterances for this module')
+    parser.add_argument('--rules', action='store_true',
+                        help='also report value() time per rule')
+    args = parser.parse_args()
+
+    by_module = collections.OrderedDict()
+    for (module, utterance) in read_corpus(args.corpus):
+        if args.module and module not in args.module:
+            continue
+        by_module.setdefault(module, []).append(utterance)
+
+    server = StandinServer(port=0)
+    server.start()
+    engine = grammar_env.setup(server.address)
+    timer = RuleTimer()
+    total = []
+    failed = []
+    try:
+        for (name, utterances) in by_module.items():
+            server.context = {
+                'title': MODULE_TITLES.get(name, DEFAULT_TITLE),
+                'executable': name, 'id': 1}
+            try:
+                results, rejected = run_module(
+                    engine, name, utterances, args.runs, timer)
+            except Exception:
+                # One module failing to load should not hide the others.
+                print >> sys.stderr, '%s failed:' % name
+                traceback.print_exc()
+                failed.append(name)
+                continue
+            for (utterance, rule, mimic, recognition) in results:
+                total.extend(mimic)
+                print ('%-16s %-24s mimic p50 %7.1fus p95 %7.1fus  '
+                       'process_recognition p50 %7.1fus  %s' % (
+                           name, rule,
+                           1e6 * percentile(mimic, 0.50),
+                           1e6 * percentile(mimic, 0.95),
+                           1e6 * percentile(recognition, 0.50)
+                           if recognition else 0.0,
+                           utterance))
+            for utterance in rejected:
+                print '%-16s not recognised: %s' % (name, utterance)
+        if args.rules:
+            print
+            for (rule, samples) in sorted(timer.value.items()):
+                print '%-32s value() n=%-6d p50 %7.1fus p95 %7.1fus' % (
+                    rule, len(samples),
+                    1e6 * percentile(samples, 0.50),
+                    1e6 * percentile(samples, 0.95))
+        if total:
+            print
+            print 'all utterances: n=%d mimic p50 %.1fus p95 %.1fus' % (
+                len(total), 1e6 * percentile(total, 0.50),
+                1e6 * percentile(total, 0.95))
+    finally:
+        server.stop()
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
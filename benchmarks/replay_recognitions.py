@@ -0,0 +1,186 @@
+"""Replay a recorded recognition log through the grammars offline.
+
+    python benchmarks/replay_recognitions.py LOG [--runs 1] [--module _vim]
+                                             [--record-to NEW_LOG]
+
+LOG is a file written by grammars/recorder.py (set recorder.RECORD_PATH
+in a Natlink session). Each recognition's module is loaded on dragonfly's
+text engine, one module at a time, with the stand-in server reporting the
+window title that was focused when it was spoken. The words are mimicked
+again in the recorded order, and the replay reports:
+
+    - actions that differ from the recorded ones, so a change to a grammar
+      or to action compilation shows up as a diff against real usage;
+    - recorded versus replayed _process_recognition time, p50/p95/p99.
+
+--record-to writes the replayed recognitions as a new log, which can be
+replayed in turn to compare two versions of the grammars.
+"""
+import argparse
+import collections
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'grammars'))
+
+import grammar_env
+from standin_server import StandinServer
+
+# How many differing recognitions to print in full.
+SHOW_DIFFERENCES = 10
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def normalised(actions):
+    """actions as they read back from a log, for comparison."""
+    return json.loads(json.dumps(actions))
+
+
+def recognitions(path):
+    """Recorded recognitions in order, each with the window title last
+    reported before it as 'title'."""
+    import recorder
+
+    title = None
+    for record in recorder.read_log(path):
+        if record['k'] == 'begin':
+            title = record['title']
+        elif record['k'] == 'rec':
+            record['title'] = title
+            yield record
+
+
+class _Collected(list):
+
+    """In-memory log for recorder.Recorder."""
+
+    write = list.append
+
+
+def mimic(engine, words):
+    """Mimic words; Dragon's written\\spoken forms are retried as spoken
+    words. Returns False if neither is recognised."""
+    from dragonfly import MimicFailure
+
+    for attempt in (words, [word.split('\\')[-1] for word in words]):
+        try:
+            engine.mimic(attempt)
+            return True
+        except MimicFailure:
+            continue
+    return False
+
+
+def replay_module(engine, server, name, records, runs, log):
+    """Replay records through module name; yields (record, replayed
+    records) pairs, None for replayed when not recognised."""
+    import dispatch
+    import recorder
+
+    before = set(engine.grammars)
+    module = grammar_env.load(name)
+    grammars = [grammar for grammar in engine.grammars
+                if grammar not in before]
+    collected = _Collected()
+    replay = recorder.Recorder(collected)
+    for grammar in grammars:
+        replay.attach(grammar)
+    try:
+        for record in records:
+            server.context = {'title': record['title'] or '',
+                              'executable': name, 'id': 1}
+            replayed = []
+            # What the first run logged, window changes included, for log.
+            first = None
+            for _ in xrange(runs):
+                del collected[:]
+                if not mimic(engine, record['w']):
+                    replayed = None
+                    break
+                dispatch.flush()
+                if first is None:
+                    first = list(collected)
+                replayed.extend(entry for entry in collected
+                                if entry['k'] == 'rec')
+            if replayed and log is not None:
+                for entry in first:
+                    log.write(entry)
+            yield record, replayed
+    finally:
+        replay.detach()
+        grammar_env.unload(module)
+        for grammar in grammars:
+            if grammar.loaded:
+                grammar.unload()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('log')
+    parser.add_argument('--runs', type=int, default=1,
+                        help='times each recognition is replayed')
+    parser.add_argument('--module', action='append',
+                        help='only replay recognitions from this module')
+    parser.add_argument('--record-to',
+                        help='write the replayed recognitions to this log')
+    args = parser.parse_args()
+
+    server = StandinServer(port=0)
+    server.start()
+    engine = grammar_env.setup(server.address)
+    import recorder
+
+    by_module = collections.OrderedDict()
+    for record in recognitions(args.log):
+        if args.module and record['m'] not in args.module:
+            continue
+        by_module.setdefault(record['m'], []).append(record)
+    log = recorder.RecognitionLog(args.record_to) if args.record_to else None
+
+    recorded, replayed_times = [], []
+    total = differing = rejected = 0
+    start = time.time()
+    try:
+        for (name, records) in by_module.items():
+            for (record, replayed) in replay_module(
+                    engine, server, name, records, args.runs, log):
+                total += 1
+                recorded.append(record['d'])
+                if replayed is None:
+                    rejected += 1
+                    print 'not recognised: %s' % ' '.join(record['w'])
+                    continue
+                replayed_times.extend(again['d'] for again in replayed)
+                actions = normalised(replayed[0]['a']) if replayed else []
+                if actions != record['a']:
+                    differing += 1
+                    if differing <= SHOW_DIFFERENCES:
+                        print 'actions differ for %r (%s.%s):' % (
+                            ' '.join(record['w']), name, record['r'])
+                        print '    recorded %s' % json.dumps(record['a'])
+                        print '    replayed %s' % json.dumps(actions)
+    finally:
+        server.stop()
+        if log is not None:
+            log.close()
+
+    print '%d recognitions replayed in %.1fs: %d with different actions, ' \
+        '%d not recognised' % (total, time.time() - start, differing,
+                               rejected)
+    for (label, samples) in (('recorded', recorded),
+                             ('replayed', replayed_times)):
+        if samples:
+            print '%-8s _process_recognition p50 %7.1fus p95 %7.1fus ' \
+                'p99 %7.1fus' % (label,
+                                 1e6 * percentile(samples, 0.50),
+                                 1e6 * percentile(samples, 0.95),
+                                 1e6 * percentile(samples, 0.99))
+
+if __name__ == '__main__':
+    main()
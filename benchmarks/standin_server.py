@@ -0,0 +1,210 @@
+"""Local, X-free stand-in for the Aenea server.
+
+Speaks the same JSON-RPC over HTTP the real server does, one request per
+connection like it, but only records what it is asked to type. Useful to
+measure the client side (grammars, batching, dispatch) on one Linux box:
+
+    python benchmarks/standin_server.py --port 8240
+
+or from code:
+
+    server = StandinServer(port=0)
+    server.start()
+    ... point a client at server.address ...
+    server.stop()
+"""
+import argparse
+import BaseHTTPServer
+import json
+import socket
+import SocketServer
+import threading
+import time
+
+
+class StandinServer(object):
+
+    """
+    Records every action as (time received, method, params) in calls and
+    every request as (time received, method, action count) in rpcs.
+
+    Parameters
+    ----------
+    host: str
+    port: int
+        0 picks a free port; see address once started
+    delay: float
+        seconds to sleep per typed action, to imitate xdotool
+    security_token: str
+        if set, calls without this token are rejected like the real server
+    context: dict
+        what get_context reports as the focused window, so proxy contexts
+        of the grammar under test match
+    """
+
+    def __init__(self, host='127.0.0.1', port=8240, delay=0.0,
+                 security_token=None, context=None):
+        self.delay = delay
+        self.security_token = security_token
+        self.context = context or {
+            'title': 'standin', 'executable': 'standin', 'id': 0}
+        self.calls = []
+        self.rpcs = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._open = set()
+        self._httpd = _HTTPServer((host, port), _Handler)
+        self._httpd.standin = self
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._httpd.server_address
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop listening and drop open connections, as a restarted
+        server would."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        with self._lock:
+            open_sockets, self._open = self._open, set()
+        for sock in open_sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def reset(self):
+        with self._lock:
+            self.calls = []
+            self.rpcs = []
+            self.connections = 0
+
+    def connected(self, sock):
+        with self._lock:
+            self.connections += 1
+            self._open.add(sock)
+
+    def disconnected(self, sock):
+        with self._lock:
+            self._open.discard(sock)
+
+    def record(self, method, params):
+        with self._lock:
+            self.calls.append((time.time(), method, params))
+
+    def record_rpc(self, method, actions):
+        with self._lock:
+            self.rpcs.append((time.time(), method, actions))
+
+    def dispatch(self, method, params):
+        if isinstance(params, dict):
+            params = dict(params)
+            token = params.pop('security_token', None)
+        else:
+            token = None
+        if self.security_token is not None and token != self.security_token:
+            raise ValueError('bad security token')
+        if method == 'multiple_actions':
+            actions = params['actions'] if isinstance(params, dict) \
+                else params[0]
+            self.record_rpc(method, len(actions))
+            for (name, _, kwargs) in actions:
+                self._action(name, kwargs)
+            return None
+        self.record_rpc(method, 1)
+        if method == 'server_info':
+            self.record(method, params)
+            return {'window_manager': 'standin', 'operating_system': 'linux',
+                    'platform': 'standin', 'display': 'none',
+                    'server': 'aenea_standin', 'server_version': 1}
+        if method == 'get_context':
+            self.record(method, params)
+            return self.context
+        return self._action(method, params)
+
+    def _action(self, method, params):
+        self.record(method, params)
+        if method == 'pause':
+            time.sleep(float(params.get('amount', 0)) / 100.0)
+        elif self.delay:
+            time.sleep(self.delay)
+
+
+class _HTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    # HTTP/1.0, and the write side shut down after every response, as
+    # aenea's server (jsonrpclib's SimpleJSONRPCRequestHandler) does.
+    protocol_version = 'HTTP/1.0'
+    # Send each response in one segment, as SimpleXMLRPCRequestHandler
+    # does.
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.server.standin.connected(self.connection)
+
+    def finish(self):
+        self.server.standin.disconnected(self.connection)
+        try:
+            BaseHTTPServer.BaseHTTPRequestHandler.finish(self)
+        except socket.error:
+            pass
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(
+            int(self.headers.getheader('content-length'))))
+        response = {'jsonrpc': '2.0', 'id': request.get('id')}
+        try:
+            response['result'] = self.server.standin.dispatch(
+                request['method'], request.get('params', []))
+        except Exception as error:
+            response['error'] = {'code': -32603, 'message': str(error)}
+        body = json.dumps(response)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.wfile.flush()
+        self.connection.shutdown(socket.SHUT_WR)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8240)
+    parser.add_argument('--delay', type=float, default=0.0,
+                        help='seconds slept per typed action')
+    parser.add_argument('--security-token')
+    parser.add_argument('--title', default='standin',
+                        help='window title reported by get_context')
+    args = parser.parse_args()
+    server = StandinServer(args.host, args.port, args.delay,
+                           args.security_token,
+                           {'title': args.title, 'executable': 'standin',
+                            'id': 0})
+    print 'Aenea stand-in server listening on %s:%d' % server.address
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
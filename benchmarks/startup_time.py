@@ -0,0 +1,117 @@
+"""Grammar startup time with and without grammar_cache.
+
+    python benchmarks/startup_time.py [--module _rstudio] [--runs 5]
+
+Each run is a fresh Python process, as each Dragon start is, that imports
+the grammar modules on dragonfly's text engine (see grammar_env) and then
+compiles every grammar they loaded with dragonfly's NatlinkCompiler, the
+step NatlinkEngine performs in Grammar.load(). Three configurations are
+timed:
+
+    off     grammar_cache.ENABLED = False
+    cold    cache enabled but empty (first start after a change)
+    warm    cache written by the cold run (every later start)
+
+and for each the import and compile times are reported, p50 and max over
+the runs.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'grammars'))
+
+MODULES = ['_rstudio', '_vim', 'catchall', 'vim2']
+
+CONFIGURATIONS = ('off', 'cold', 'warm')
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def start(modules, enabled, cache_dir):
+    """Load modules in this process; returns {'import': s, 'compile': s}."""
+    import grammar_env
+    from standin_server import StandinServer
+
+    server = StandinServer(port=0)
+    server.start()
+    try:
+        engine = grammar_env.setup(server.address)
+        import grammar_cache
+        grammar_cache.ENABLED = enabled
+        grammar_cache.CACHE_DIR = cache_dir
+
+        began = time.time()
+        for name in modules:
+            grammar_env.load(name, settle=False)
+        grammar_env.load_deferred()
+        imported = time.time()
+
+        from dragonfly.engines.backend_natlink.compiler import NatlinkCompiler
+        grammar_cache.install()
+        for grammar in list(engine.grammars):
+            NatlinkCompiler().compile_grammar(grammar)
+        compiled = time.time()
+        grammar_cache.flush()
+    finally:
+        server.stop()
+    return {'import': imported - began, 'compile': compiled - imported}
+
+
+def run_child(modules, configuration, cache_dir):
+    output = subprocess.check_output(
+        [sys.executable, __file__, '--child', configuration,
+         '--cache-dir', cache_dir] +
+        ['--module=%s' % name for name in modules])
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--module', action='append', choices=MODULES,
+                        help='module to load (default: all)')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--child', choices=CONFIGURATIONS,
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--cache-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    modules = args.module or MODULES
+
+    if args.child:
+        print json.dumps(start(modules, args.child != 'off', args.cache_dir))
+        return
+
+    timings = dict((configuration, []) for configuration in CONFIGURATIONS)
+    cache_dir = tempfile.mkdtemp(prefix='grammar_cache_')
+    try:
+        for _ in xrange(args.runs):
+            timings['off'].append(run_child(modules, 'off', cache_dir))
+            shutil.rmtree(cache_dir)
+            os.mkdir(cache_dir)
+            timings['cold'].append(run_child(modules, 'cold', cache_dir))
+            timings['warm'].append(run_child(modules, 'warm', cache_dir))
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print 'startup of %s, %d runs each' % (', '.join(modules), args.runs)
+    for configuration in CONFIGURATIONS:
+        line = ['%-5s' % configuration]
+        for phase in ('import', 'compile'):
+            samples = [timing[phase] for timing in timings[configuration]]
+            line.append('%s p50 %7.1fms max %7.1fms' % (
+                phase, 1e3 * percentile(samples, 0.5), 1e3 * max(samples)))
+        total = [timing['import'] + timing['compile']
+                 for timing in timings[configuration]]
+        line.append('total p50 %7.1fms' % (1e3 * percentile(total, 0.5)))
+        print '  '.join(line)
+
+if __name__ == '__main__':
+    main()
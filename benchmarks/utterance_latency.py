@@ -0,0 +1,148 @@
+"""End-to-end latency of the vim grammars against the Aenea stand-in server.
+
+    python benchmarks/utterance_latency.py [--grammar _rstudio] [--runs 50]
+
+Loads _rstudio.py and/or _vim.py on dragonfly's text engine (see
+grammar_env) with aenea pointed at a StandinServer, then mimics phrases
+taken from each rule type VimCommand is built from. For every utterance
+type it reports:
+
+    callback   mimic() returning, i.e. how long Natlink would be held
+    e2e        mimic() start until the server received the last action
+    rpcs       HTTP requests per utterance, and how many were actions
+
+Needs dragonfly2 and the aenea client package; Natlink, Dragon and X are
+not.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'grammars'))
+
+import grammar_env
+from standin_server import StandinServer
+
+# A window title both grammars' proxy contexts accept.
+TITLE = 'Rstudio - mike@eohippus'
+
+# Utterance types, as (label, mapping attribute of the module's
+# vim_core.VimOverlay).
+RULE_TYPES = (
+    ('insertion', 'key_insertions'),
+    ('arithmetic', 'arithmetic_insertions'),
+    ('motion', 'motions'),
+    ('command', 'commands'),
+    )
+
+# Phrases per rule type; more only repeats the same shapes of action.
+PHRASES_PER_TYPE = 20
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def utterances(module):
+    """{label: [phrase]} for module, including chained utterances that
+    exercise VimCommand's Repetition."""
+    found = {}
+    for (label, attribute) in RULE_TYPES:
+        mapping = getattr(module.overlay, attribute, None)
+        if not mapping:
+            continue
+        phrases = [phrase for (_, phrase)
+                   in grammar_env.mapping_phrases(mapping)]
+        found[label] = phrases[:PHRASES_PER_TYPE]
+    singles = [found[label][0] for label in ('command', 'motion', 'arithmetic')
+               if found.get(label)]
+    if singles:
+        found['chained'] = [' '.join(singles * count) for count in (1, 2, 3)]
+    return found
+
+
+def measure(engine, server, phrase, runs):
+    """Mimic phrase runs times; returns (callback, e2e, rpcs, actions)
+    lists, or None if the grammar does not accept the phrase."""
+    import dispatch
+    from dragonfly import MimicFailure
+
+    callback, e2e, rpcs, actions = [], [], [], []
+    words = phrase.split()
+    for _ in xrange(runs):
+        server.reset()
+        start = time.time()
+        try:
+            engine.mimic(words)
+        except MimicFailure:
+            return None
+        returned = time.time()
+        dispatch.flush()
+        received = list(server.rpcs)
+        action_rpcs = [rpc for rpc in received if rpc[1] != 'get_context']
+        last = action_rpcs[-1][0] if action_rpcs else returned
+        callback.append(returned - start)
+        e2e.append(max(last, returned) - start)
+        rpcs.append(len(received))
+        actions.append(sum(rpc[2] for rpc in action_rpcs))
+    return callback, e2e, rpcs, actions
+
+
+def report(name, label, results):
+    callback = [sample for result in results for sample in result[0]]
+    e2e = [sample for result in results for sample in result[1]]
+    rpcs = [sample for result in results for sample in result[2]]
+    actions = [sample for result in results for sample in result[3]]
+    print ('%-8s %-10s n=%-5d callback p50 %6.2fms  '
+           'e2e p50 %6.2fms p95 %6.2fms p99 %6.2fms  '
+           'rpcs %.1f (actions %.1f)' % (
+               name, label, len(e2e),
+               1e3 * percentile(callback, 0.50),
+               1e3 * percentile(e2e, 0.50),
+               1e3 * percentile(e2e, 0.95),
+               1e3 * percentile(e2e, 0.99),
+               float(sum(rpcs)) / len(rpcs),
+               float(sum(actions)) / len(actions)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--grammar', action='append',
+                        choices=['_rstudio', '_vim'],
+                        help='grammar module to load (default: both)')
+    parser.add_argument('--runs', type=int, default=50,
+                        help='mimics per phrase')
+    parser.add_argument('--delay', type=float, default=0.0,
+                        help='server seconds per typed action')
+    args = parser.parse_args()
+
+    server = StandinServer(port=0, delay=args.delay, context={
+        'title': TITLE, 'executable': 'rstudio', 'id': 1})
+    server.start()
+    engine = grammar_env.setup(server.address)
+    try:
+        # One overlay at a time, so the shared 'vim' grammar holds only the
+        # VimCommand of the module being measured.
+        for name in args.grammar or ['_rstudio', '_vim']:
+            module = grammar_env.load(name)
+            try:
+                for (label, phrases) in sorted(utterances(module).items()):
+                    results = []
+                    for phrase in phrases:
+                        result = measure(engine, server, phrase, args.runs)
+                        if result is None:
+                            print '%-8s %-10s not recognised: %r' % (
+                                name, label, phrase)
+                        else:
+                            results.append(result)
+                    if results:
+                        report(name, label, results)
+            finally:
+                grammar_env.unload(module)
+    finally:
+        server.stop()
+
+if __name__ == '__main__':
+    main()
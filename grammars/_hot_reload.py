@@ -0,0 +1,38 @@
+'''Reloads edited grammar modules without restarting Dragon (see
+   hot_reload.py). Changed files are looked for at the start of every
+   utterance; "reload grammars" looks at once.'''
+
+import dragonfly
+
+import hot_reload
+
+reloader = hot_reload.Reloader()
+
+
+class ReloadRule(dragonfly.CompoundRule):
+    spec = 'reload grammars'
+
+    # (executable, title, handle) of the utterance under way.
+    window = None
+
+    def process_begin(self, executable, title, handle):
+        self.window = (executable, title, handle)
+        dragonfly.CompoundRule.process_begin(self, executable, title, handle)
+
+    def _process_begin(self):
+        if hot_reload.ENABLED:
+            reloader.check(window=self.window)
+
+    def _process_recognition(self, node, extras):
+        reloader.check(force=True, window=self.window)
+
+grammar = dragonfly.Grammar('hot reload')
+grammar.add_rule(ReloadRule())
+grammar.load()
+
+
+def unload():
+    global grammar
+    if grammar:
+        grammar.unload()
+    grammar = None
@@ -0,0 +1,28 @@
+'''Voice commands for the latency spans collected by tracing.py.
+
+   "latency report" prints the rolling histograms to the Natlink window and
+   writes the Chrome trace to tracing.TRACE_PATH; "latency reset" starts
+   over.'''
+
+from aenea import Grammar, MappingRule, Function
+
+import tracing
+
+grammar = Grammar('latency tracing')
+
+
+class LatencyRule(MappingRule):
+    mapping = {
+        'latency report': Function(lambda: tracing.dump()),
+        'latency reset': Function(lambda: tracing.tracer.reset()),
+        }
+
+grammar.add_rule(LatencyRule())
+grammar.load()
+
+
+def unload():
+    global grammar
+    if grammar:
+        grammar.unload()
+    grammar = None
@@ -0,0 +1,156 @@
+"""Load-time rewriting of Key() keystroke chains into Text() writes.
+
+Template entries like Key('f, o, r, lparen, i, space, ...') send one key
+event per character. compile_action splits such a spec into runs of plain
+printable keys, which become a single Text (one write_text on the server),
+and the remaining control keys (left:2, escape, enter, anything with
+modifiers or delays), which stay Key presses. Dynamic specs (containing
+'%') are left untouched since their keys are only known at execution time.
+"""
+import re
+
+import aenea
+from dragonfly.actions.action_base import ActionSeries
+
+import tracing
+
+# Key names whose unmodified press types exactly this character.
+PRINTABLE_KEYS = {
+    'ampersand': '&',
+    'apostrophe': "'",
+    'asterisk': '*',
+    'at': '@',
+    'backslash': '\\',
+    'backtick': '`',
+    'bar': '|',
+    'caret': '^',
+    'colon': ':',
+    'comma': ',',
+    'dollar': '$',
+    'dot': '.',
+    'dquote': '"',
+    'equal': '=',
+    'equals': '=',
+    'exclamation': '!',
+    'hash': '#',
+    'hyphen': '-',
+    'langle': '<',
+    'lbrace': '{',
+    'lbracket': '[',
+    'lparen': '(',
+    'minus': '-',
+    'percent': '%',
+    'plus': '+',
+    'question': '?',
+    'rangle': '>',
+    'rbrace': '}',
+    'rbracket': ']',
+    'rparen': ')',
+    'semicolon': ';',
+    'slash': '/',
+    'space': ' ',
+    'squote': "'",
+    'tilde': '~',
+    'underscore': '_',
+    }
+for _char in ('abcdefghijklmnopqrstuvwxyz'
+              'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'):
+    PRINTABLE_KEYS[_char] = _char
+del _char
+
+# Shortest run of printable keys worth turning into a Text.
+MIN_RUN = 2
+
+_ELEMENT = re.compile(r'^(?P<name>[^-:/]+)(?::(?P<count>\d+))?$')
+
+
+def printable_text(element):
+    """Return the text typed by a Key spec element, or None if it is a
+    control key (modifiers, delays, direction or a non-printable key)."""
+    match = _ELEMENT.match(element.strip())
+    if match is None:
+        return None
+    char = PRINTABLE_KEYS.get(match.group('name'))
+    if char is None:
+        return None
+    return char * int(match.group('count') or 1)
+
+
+def split_key_spec(spec):
+    """
+    Split a Key spec into runs of text and control keys.
+
+    Parameters
+    ----------
+    spec: str
+        static Key spec, e.g. 'f, o, r, lparen, rparen, left:2'
+
+    Returns
+    -------
+    List[Tuple[str, str]]
+        ('text', characters) and ('key', spec) pieces in original order
+    """
+    pieces = []
+    run = []
+
+    def flush_run():
+        if len(run) >= MIN_RUN:
+            pieces.append(('text', ''.join(text for (_, text) in run)))
+        else:
+            pieces.extend(('key', element) for (element, _) in run)
+        del run[:]
+
+    for element in spec.split(','):
+        element = element.strip()
+        text = printable_text(element)
+        if text is None:
+            flush_run()
+            pieces.append(('key', element))
+        else:
+            run.append((element, text))
+    flush_run()
+
+    merged = []
+    for (kind, value) in pieces:
+        if merged and merged[-1][0] == kind:
+            joiner = ', ' if kind == 'key' else ''
+            merged[-1] = (kind, merged[-1][1] + joiner + value)
+        else:
+            merged.append((kind, value))
+    return merged
+
+
+def compile_action(action):
+    """Return an equivalent action with printable key runs written as Text.
+
+    Actions that cannot be improved are returned unchanged (same object)."""
+    if isinstance(action, ActionSeries):
+        compiled = [compile_action(child) for child in action._actions]
+        if all(new is old for (new, old) in zip(compiled, action._actions)):
+            return action
+        return _join(compiled)
+    if not isinstance(action, aenea.Key) or '%' in action._spec:
+        return action
+    pieces = split_key_spec(action._spec)
+    if all(kind == 'key' for (kind, _) in pieces):
+        return action
+    # Text specs are %-formatted with the recognition's extras.
+    return _join([
+        type(action)(value) if kind == 'key'
+        else aenea.Text(value.replace('%', '%%'))
+        for (kind, value) in pieces])
+
+
+def compile_mapping(mapping):
+    """Compile every action of a MappingRule mapping; other values (plain
+    strings used as markers) are kept as they are."""
+    with tracing.span('compile_mapping', actions=len(mapping)):
+        return dict((spec, compile_action(value))
+                    for (spec, value) in mapping.iteritems())
+
+
+def _join(actions):
+    result = actions[0]
+    for action in actions[1:]:
+        result = result + action
+    return result
@@ -14,11 +14,25 @@
 
 import Tkinter as tk
 import tkFont
+import argparse
+import collections
 import datetime
+import logging
+import logging.handlers
+import os
+import socket
+import sys
 import threading
+import time
 import ttk
 
 import aenea
+import aenea.config
+
+try:
+    import pyinotify
+except ImportError:
+    pyinotify = None
 
 # Keys that should be translated from a TK name to the name expected by
 # the server.
@@ -50,75 +64,352 @@ IGNORED_KEYS = ('Shift_L', 'Control_L')
 
 ALT_KEY_SEQUENCE_MAP = {u'\u2013' : 'hyphen'}
 
+# How long (seconds) the worker waits after the first buffered key for more
+# keys to arrive before sending, so a burst of dictated keys goes out as one
+# execute_batch. 0 sends as soon as the worker wakes.
+COALESCE_WINDOW = 0.010
+
+# Send without waiting out the window once this many keys are buffered.
+MAX_BATCH_KEYS = 64
+
+# Longest time (seconds) before an edit to dictation_capture_state is
+# noticed when inotify is not available.
+CONFIG_POLL_INTERVAL = 0.25
+
+# Caps on what the Log and Capture panes hold; the oldest entries are
+# dropped first.
+LOG_MAX_LINES = 1000
+LOG_MAX_CHARS = 100000
+CAPTURE_MAX_CHARS = 20000
+
+# Panes are redrawn at most this often (milliseconds), not per key.
+PANE_REFRESH_MS = 100
+
+# If set, log lines dropped from the Log pane are appended to this file,
+# rotated at LOG_SPILL_BYTES with LOG_SPILL_BACKUPS old copies.
+LOG_SPILL_PATH = None
+LOG_SPILL_BYTES = 1024 * 1024
+LOG_SPILL_BACKUPS = 3
+
+CONFIG_NAME = 'dictation_capture_state'
+
 _config = aenea.configuration.ConfigWatcher(
-    'dictation_capture_state',
+    CONFIG_NAME,
     {'enabled': True})
 
 
+def config_path(name):
+    '''The file aenea's ConfigWatcher(name) reads, or None if aenea.config
+       names no project root.'''
+    root = getattr(aenea.config, 'PROJECT_ROOT', None)
+    if root is None:
+        return None
+    return os.path.join(root, name + '.json')
+
+
+class ConfigSnapshot(object):
+    '''In-memory copy of the dictation_capture_state settings, so the
+       keypress path reads a cached flag instead of stat'ing the file.
+
+       Changes to path, the file watcher reads, are picked up by inotify
+       when pyinotify is installed (Linux); otherwise, or without a path,
+       by polling the ConfigWatcher every interval seconds.'''
+
+    def __init__(self, watcher, path=None, interval=CONFIG_POLL_INTERVAL):
+        self.watcher = watcher
+        self.interval = interval
+        self.enabled = True
+        self.stopped = threading.Event()
+        self.update()
+        if pyinotify is not None and path is not None:
+            self.start_inotify(path)
+        else:
+            poller = threading.Thread(target=self.poll)
+            poller.daemon = True
+            poller.start()
+
+    def update(self):
+        try:
+            self.watcher.refresh()
+        except (IOError, OSError, ValueError):
+            # Half-written file; keep the last good settings.
+            return
+        self.enabled = bool(self.watcher.conf.get('enabled', True))
+
+    def poll(self):
+        while not self.stopped.wait(self.interval):
+            self.update()
+
+    def start_inotify(self, path):
+        directory, filename = os.path.split(os.path.abspath(path))
+        snapshot = self
+
+        class Handler(pyinotify.ProcessEvent):
+            def process_default(self, event):
+                if event.name == filename:
+                    snapshot.update()
+
+        manager = pyinotify.WatchManager()
+        self.notifier = pyinotify.ThreadedNotifier(manager, Handler())
+        self.notifier.daemon = True
+        self.notifier.start()
+        manager.add_watch(
+            directory, pyinotify.IN_CLOSE_WRITE | pyinotify.IN_MOVED_TO)
+
+    def stop(self):
+        self.stopped.set()
+        if getattr(self, 'notifier', None) is not None:
+            self.notifier.stop()
+
+
+class BatchMetrics(object):
+    '''Batch size (keys per execute_batch) and flush latency (first key
+       buffered to batch acknowledged) of what ProxyBuffer sends.'''
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.batches = 0
+        self.keys = 0
+        self.max_keys = 0
+        self.latency = 0.0
+        self.max_latency = 0.0
+
+    def record(self, keys, latency):
+        self.batches += 1
+        self.keys += keys
+        self.max_keys = max(self.max_keys, keys)
+        self.latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def summary(self):
+        if not self.batches:
+            return 'no batches sent'
+        return ('%d batches, %.1f keys/batch (max %d), '
+                'flush latency %.1fms (max %.1fms)' % (
+                    self.batches,
+                    float(self.keys) / self.batches,
+                    self.max_keys,
+                    1000 * self.latency / self.batches,
+                    1000 * self.max_latency))
+
+
+class _Flush(object):
+    '''Queue marker; its event is set once every key queued before it has
+       been sent.'''
+
+    def __init__(self):
+        self.done = threading.Event()
+
+_STOP = object()
+
+
 class ProxyBuffer(object):
-    def __init__(self, log=lambda msg: None):
+    '''Hands keys from the capture thread to a sender thread.
+
+       send_key is the only producer and worker_thread the only consumer of
+       a deque, whose append and popleft are atomic, so a keypress takes no
+       lock. The worker wakes on an event the producer sets only when it is
+       clear, waits out the coalescing window and sends everything queued
+       as execute_batch calls of at most max_batch keys each.'''
+
+    def __init__(self, log=lambda msg: None, window=COALESCE_WINDOW,
+                 max_batch=MAX_BATCH_KEYS):
         self.log = log
-        self.text_buffer = []
-        self.key_buffer = []
-        self.buffer_lock = threading.Lock()
-        self.buffer_ready = threading.Condition(self.buffer_lock)
-        self.to_send = aenea.communications.BatchProxy()
-        self.aenea_worker_active = False
-        self.sending = False
-        threading.Thread(target=self.worker_thread).start()
+        self.window = window
+        self.max_batch = max_batch
+        self.metrics = BatchMetrics()
+        self.first_pending = None
+        self.in_flight = 0
+        self.queue = collections.deque()
+        self.wakeup = threading.Event()
+        self.full = threading.Event()
+        self.worker = threading.Thread(target=self.worker_thread)
+        self.worker.daemon = True
+        self.worker.start()
+
+    @property
+    def pending(self):
+        '''Number of keys queued or being sent.'''
+        return len(self.queue) + self.in_flight
 
     def start_capture(self):
-        with self.buffer_lock:
-            while self.sending:
-                self.buffer_ready.wait()
-            aenea.ProxyKey('Control_R').execute()
+        self.flush()
+        aenea.ProxyKey('Control_R').execute()
 
     def send_key(self, key):
-        with self.buffer_lock:
-            assert not self.text_buffer or not self.key_buffer
-            if key in LITERAL_KEYS:
-                self.flush_key_buffer()
-                self.text_buffer.append(key)
-            else:
-                self.flush_text_buffer()
-                if self.key_buffer and self.key_buffer[-1][0] == key:
-                    self.key_buffer[-1] = (key, self.key_buffer[-1][1] + 1)
-                else:
-                    self.key_buffer.append((key, 1))
-            self.buffer_ready.notify()
-
-    # Requires buffer_lock
-    def flush_text_buffer(self):
-        if self.text_buffer:
-            self.to_send.write_text(''.join(self.text_buffer))
-            self.text_buffer = []
-
-    # Requires buffer_lock
-    def flush_key_buffer(self):
-        if self.key_buffer:
-            for (key, count) in self.key_buffer:
-                self.to_send.key_press(key=key, count=count)
-            self.key_buffer = []
+        self.queue.append(key)
+        if not self.wakeup.is_set():
+            self.first_pending = time.time()
+            self.wakeup.set()
+        if len(self.queue) >= self.max_batch and not self.full.is_set():
+            self.full.set()
+
+    def flush(self, timeout=None):
+        '''Block until every key sent so far has reached the server.
+           Returns False if timeout ran out first.'''
+        marker = _Flush()
+        self.queue.append(marker)
+        if not self.wakeup.is_set():
+            self.first_pending = None
+            self.wakeup.set()
+        return marker.done.wait(timeout)
+
+    def close(self):
+        '''Send what is queued and stop the worker thread.'''
+        self.queue.append(_STOP)
+        self.wakeup.set()
+        self.worker.join()
 
     def worker_thread(self):
         while 1:
-            with self.buffer_lock:
-
-                # Wait until we have something to send.
-                while not (self.text_buffer or self.key_buffer or self.to_send._commands):
-                    assert not self.text_buffer or not self.key_buffer
-                    self.sending = False
-                    self.buffer_ready.wait()
-                    self.sending = True
-
-                assert not self.text_buffer or not self.key_buffer
-                self.flush_text_buffer()
-                self.flush_key_buffer()
-
-                todo, self.to_send = self.to_send, aenea.communications.BatchProxy()
+            self.wakeup.wait()
+            first_pending = self.first_pending
+
+            # Let the rest of a burst arrive, unless the batch is full.
+            if self.window and first_pending is not None:
+                remaining = first_pending + self.window - time.time()
+                if remaining > 0:
+                    self.full.wait(remaining)
+            self.wakeup.clear()
+            self.full.clear()
+
+            # Send what is queued in batches of at most max_batch keys,
+            # until the queue is empty. in_flight is raised before each
+            # pop so pending never reads low.
+            while self.queue:
+                keys = []
+                while self.queue and len(keys) < self.max_batch:
+                    self.in_flight = len(keys) + 1
+                    item = self.queue.popleft()
+                    if item is _STOP:
+                        self.send(keys, first_pending)
+                        self.in_flight = 0
+                        return
+                    elif isinstance(item, _Flush):
+                        self.send(keys, first_pending)
+                        keys = []
+                        self.in_flight = 0
+                        item.done.set()
+                    else:
+                        keys.append(item)
+                self.send(keys, first_pending)
+                self.in_flight = 0
+
+    def send(self, keys, first_pending):
+        if not keys:
+            return
+        aenea.communications.server.execute_batch(encode_keys(keys))
+        if first_pending is not None:
+            self.metrics.record(len(keys), time.time() - first_pending)
+
+
+_LITERAL_SET = frozenset(LITERAL_KEYS)
+
+
+def encode_keys(keys):
+    '''Turn a run of keys into server commands: consecutive literal keys
+       become one write_text, repeats of another key one key_press.'''
+    commands = []
+    text = []
+    last_key = None
+    count = 0
+    for key in keys:
+        if key in _LITERAL_SET:
+            if last_key is not None:
+                commands.append(
+                    ('key_press', (), {'key': last_key, 'count': count}))
+                last_key = None
+            text.append(key)
+        elif key == last_key:
+            count += 1
+        else:
+            if text:
+                commands.append(('write_text', (), {'text': ''.join(text)}))
+                text = []
+            elif last_key is not None:
+                commands.append(
+                    ('key_press', (), {'key': last_key, 'count': count}))
+            last_key = key
+            count = 1
+    if text:
+        commands.append(('write_text', (), {'text': ''.join(text)}))
+    elif last_key is not None:
+        commands.append(('key_press', (), {'key': last_key, 'count': count}))
+    return commands
+
+class RingLog(object):
+    '''Bounded text model behind a Tk Text pane.
+
+       append() only updates the model and may be called from any thread;
+       render() brings the widget up to date in one delete and one insert
+       and is meant to be called periodically from the Tk thread.'''
+
+    def __init__(self, max_entries=None, max_chars=None, spill=None):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.spill = spill
+        self.entries = collections.deque()
+        self.chars = 0
+        self.lock = threading.Lock()
+        self.unrendered = []
+        self.rendered_chars = 0
+        self.evicted_chars = 0
+
+    def append(self, text):
+        with self.lock:
+            self.entries.append(text)
+            self.chars += len(text)
+            self.unrendered.append(text)
+            while self.entries and (
+                    (self.max_entries is not None
+                     and len(self.entries) > self.max_entries) or
+                    (self.max_chars is not None
+                     and self.chars > self.max_chars)):
+                old = self.entries.popleft()
+                self.chars -= len(old)
+                self.evicted_chars += len(old)
+                if self.spill is not None:
+                    self.spill.info(old.rstrip('\n'))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.chars = 0
+            self.unrendered = []
+            self.evicted_chars = self.rendered_chars
+
+    def render(self, widget):
+        with self.lock:
+            if not self.unrendered and not self.evicted_chars:
+                return
+            evicted, self.evicted_chars = self.evicted_chars, 0
+            unrendered, self.unrendered = self.unrendered, []
+            if evicted >= self.rendered_chars:
+                # Everything on screen is gone; redraw from the model.
+                widget.delete('1.0', tk.END)
+                text = ''.join(self.entries)
+            else:
+                widget.delete('1.0', '1.0 + %d chars' % evicted)
+                text = ''.join(unrendered)
+            self.rendered_chars = self.chars
+        if text:
+            widget.insert(tk.END, text)
+        widget.see(tk.END)  # Scroll to end.
+
+
+def make_spill_logger(path):
+    '''Logger writing evicted log lines to a rotating file at path.'''
+    logger = logging.getLogger('aenea_client.spill')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=LOG_SPILL_BYTES, backupCount=LOG_SPILL_BACKUPS)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    return logger
 
-            if todo._commands:
-                aenea.communications.server.execute_batch(todo._commands)
 
 class AltKeySequenceState(object):
     NO_SEQUENCE = 0
@@ -126,11 +417,85 @@ class AltKeySequenceState(object):
     IN_ALT_SEQUENCE = 2
     ENDING_ALT_SEQUENCE = 3
 
+
+_ALT_START = object()
+
+
+def compile_key(key):
+    '''(display, send) for a keysym outside an alt sequence; see
+       KeyTranslator.translate.'''
+    if key == 'Alt_L':
+        return _ALT_START
+    display = key if key != 'space' else ' '
+    if key in IGNORED_KEYS:
+        return display, None
+    return display, TRANSLATE_KEYS.get(key, key)
+
+
+class KeyTranslator(object):
+    '''Turns Tk key events (char, keysym) into keys for ProxyBuffer,
+       including Dragon's Alt+0... unicode sequences. Shared by the Tk
+       client and headless capture.
+
+       Outside an alt sequence (nearly every event) translation is a
+       single lookup in a table of precompiled results; keysyms not seen
+       before are compiled once and added to it.'''
+
+    def __init__(self):
+        self.alt_key_sequence = AltKeySequenceState.NO_SEQUENCE
+        self.table = dict((key, compile_key(key)) for key in (
+            list(TRANSLATE_KEYS) + list(LITERAL_KEYS) + list(IGNORED_KEYS)
+            + ['Alt_L']))
+        self.alt_table = dict(
+            (char, ('??', send))
+            for (char, send) in ALT_KEY_SEQUENCE_MAP.iteritems())
+
+    def translate(self, char, key):
+        '''Returns (display, send). display is None when the event is part
+           of an alt sequence and shows nothing; otherwise it is the text
+           to echo in the capture pane. send is the key to send, or None
+           for ignored keys.'''
+        if self.alt_key_sequence == AltKeySequenceState.NO_SEQUENCE:
+            try:
+                result = self.table[key]
+            except KeyError:
+                result = self.table[key] = compile_key(key)
+            if result is _ALT_START:
+                self.alt_key_sequence = \
+                    AltKeySequenceState.STARTING_ALT_SEQUENCE
+                return None, None
+            return result
+        return self.translate_sequence(char, key)
+
+    def translate_sequence(self, char, key):
+        if self.alt_key_sequence == AltKeySequenceState.STARTING_ALT_SEQUENCE:
+            if key == 'Alt_L':
+                return None, None
+            if key == '0':
+                self.alt_key_sequence = AltKeySequenceState.IN_ALT_SEQUENCE
+                return None, None
+            self.alt_key_sequence = AltKeySequenceState.NO_SEQUENCE
+            return self.translate(char, key)
+
+        # IN_ALT_SEQUENCE: swallow everything up to the '??' keysym Tk
+        # reports for the composed character.
+        if key == 'Alt_L':
+            self.alt_key_sequence = AltKeySequenceState.STARTING_ALT_SEQUENCE
+            return None, None
+        if key != '??':
+            return None, None
+        self.alt_key_sequence = AltKeySequenceState.NO_SEQUENCE
+        try:
+            return self.alt_table[char]
+        except KeyError:
+            return '??', char
+
+
 class AeneaClient(tk.Tk):
 
     def __init__(self):
         tk.Tk.__init__(self)
-        self.alt_key_sequence = AltKeySequenceState.NO_SEQUENCE
+        self.translator = KeyTranslator()
         self.wm_title('Aenea client - Dictation capturing')
         self.geometry('400x600+400+0')
         self.wait_visibility(self)
@@ -205,12 +570,32 @@ class AeneaClient(tk.Tk):
         note.add(self.tab2, text='Configuration')
         note.pack(side=tk.LEFT, fill=tk.BOTH, expand=tk.YES)
 
+        self.log_model = RingLog(
+            max_entries=LOG_MAX_LINES,
+            max_chars=LOG_MAX_CHARS,
+            spill=make_spill_logger(LOG_SPILL_PATH) if LOG_SPILL_PATH else None)
+        self.capture_model = RingLog(max_chars=CAPTURE_MAX_CHARS)
+        self.refresh_panes()
+
         self.proxy_buffer = ProxyBuffer(log=self.log)
+        self.config = ConfigSnapshot(_config, config_path(CONFIG_NAME))
+        self.protocol('WM_DELETE_WINDOW', self.close)
+
+    def close(self):
+        '''Send the keys still in the coalescing window, then exit.'''
+        self.unbind('<Any KeyPress>')
+        self.proxy_buffer.close()
+        self.config.stop()
+        self.destroy()
+
+    def refresh_panes(self):
+        self.capture_model.render(self.tab1.text1)
+        self.log_model.render(self.tab1.text2)
+        self.after(PANE_REFRESH_MS, self.refresh_panes)
 
     def log(self, message):
         timeStamp = datetime.datetime.now()
-        self.tab1.text2.insert(tk.END, '%s: %s\n' % (timeStamp, message))
-        self.tab1.text2.see(tk.END)  # Scroll to end.
+        self.log_model.append('%s: %s\n' % (timeStamp, message))
 
     def start_capture(self):
         # Release VirtualBox keyboard capture.
@@ -221,7 +606,7 @@ class AeneaClient(tk.Tk):
         self.button2.config(state=tk.NORMAL)
 
     def stop_capture(self):
-        self.log('Stopping capture')
+        self.log('Stopping capture (%s)' % self.proxy_buffer.metrics.summary())
         self.bind('<Any KeyPress>', self.dummy_event)
         self.button1.config(state=tk.NORMAL)
         self.button2.config(state=tk.DISABLED)
@@ -230,42 +615,170 @@ class AeneaClient(tk.Tk):
         pass
 
     def send_key(self, char, key):
-        _config.refresh()
-        if not _config.conf.get('enabled', True):
+        if not self.config.enabled:
             return
 
-        if key == 'Alt_L':
-            self.alt_key_sequence = AltKeySequenceState.STARTING_ALT_SEQUENCE
+        display, key = self.translator.translate(char, key)
+        if display is None:
             return
+        if self.display_entered_text.get():
+            self.capture_model.append(display)
+        if key is not None:
+            self.proxy_buffer.send_key(key)
 
-        if self.alt_key_sequence == AltKeySequenceState.STARTING_ALT_SEQUENCE:
-            if key == '0':
-                self.alt_key_sequence = AltKeySequenceState.IN_ALT_SEQUENCE
-                return
-            else:
-                self.alt_key_sequence = AltKeySequenceState.NO_SEQUENCE
+    def clear_text(self):
+        self.capture_model.clear()
+
+
+# Keysyms for characters read in headless --raw mode: the names Tk reports
+# for whitespace and ASCII punctuation. Letters and digits are their own
+# keysyms.
+RAW_KEYSYMS = {
+    ' ': 'space',
+    '\n': 'Return',
+    '\t': 'Tab',
+    '\x08': 'BackSpace',
+    '!': 'exclam',
+    '"': 'quotedbl',
+    '#': 'numbersign',
+    '$': 'dollar',
+    '%': 'percent',
+    '&': 'ampersand',
+    "'": 'apostrophe',
+    '(': 'parenleft',
+    ')': 'parenright',
+    '*': 'asterisk',
+    '+': 'plus',
+    ',': 'comma',
+    '-': 'minus',
+    '.': 'period',
+    '/': 'slash',
+    ':': 'colon',
+    ';': 'semicolon',
+    '<': 'less',
+    '=': 'equal',
+    '>': 'greater',
+    '?': 'question',
+    '@': 'at',
+    '[': 'bracketleft',
+    '\\': 'backslash',
+    ']': 'bracketright',
+    '^': 'asciicircum',
+    '_': 'underscore',
+    '`': 'grave',
+    '{': 'braceleft',
+    '|': 'bar',
+    '}': 'braceright',
+    '~': 'asciitilde',
+}
 
-        if self.alt_key_sequence == AltKeySequenceState.IN_ALT_SEQUENCE:
-            if key == '??':
-                self.alt_key_sequence = AltKeySequenceState.ENDING_ALT_SEQUENCE
-            else:
-                return
 
-        if self.display_entered_text.get():
-            self.tab1.text1.insert(tk.END, (key if key != 'space' else ' '))
-            self.tab1.text1.see(tk.END)  # Scroll to end.
-        if key in IGNORED_KEYS:
-            return
+def read_events(stream, raw=False):
+    '''Yield (char, keysym) events from stream.
 
-        if self.alt_key_sequence == AltKeySequenceState.ENDING_ALT_SEQUENCE:
-            self.alt_key_sequence = AltKeySequenceState.NO_SEQUENCE
-            self.proxy_buffer.send_key(ALT_KEY_SEQUENCE_MAP.get(char, char))
+       By default every line is one event, 'keysym' or 'keysym<TAB>char'
+       (utf-8), as Tk would report it. With raw, every character of the
+       stream is typed as is.'''
+    if raw:
+        while 1:
+            data = stream.read(4096)
+            if not data:
+                return
+            for char in data.decode('utf-8', 'replace'):
+                yield char, RAW_KEYSYMS.get(char, char)
+    else:
+        for line in stream:
+            line = line.decode('utf-8', 'replace').rstrip('\r\n')
+            if not line:
+                continue
+            key, _, char = line.partition('\t')
+            if not char and len(key) == 1:
+                char = key
+            yield char, key
+
+
+def run_headless(stream, proxy_buffer, translator, config, raw=False):
+    '''Feed events from stream to proxy_buffer; returns the event count.'''
+    count = 0
+    send_key = proxy_buffer.send_key
+    translate = translator.translate
+    for (char, key) in read_events(stream, raw):
+        count += 1
+        if not config.enabled:
+            continue
+        key = translate(char, key)[1]
+        if key is not None:
+            send_key(key)
+    return count
+
+
+def headless_main(args):
+    proxy_buffer = ProxyBuffer()
+    translator = KeyTranslator()
+    config = ConfigSnapshot(_config, config_path(CONFIG_NAME))
+    count = 0
+    start = time.time()
+    try:
+        if args.listen:
+            host, _, port = args.listen.rpartition(':')
+            listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            listener.bind((host or '127.0.0.1', int(port)))
+            listener.listen(1)
+            while 1:
+                connection, _ = listener.accept()
+                stream = connection.makefile('rb')
+                count += run_headless(
+                    stream, proxy_buffer, translator, config, args.raw)
+                stream.close()
+                connection.close()
+                proxy_buffer.flush()
+        elif args.input:
+            with open(args.input, 'rb') as stream:
+                count += run_headless(
+                    stream, proxy_buffer, translator, config, args.raw)
         else:
-            self.proxy_buffer.send_key(TRANSLATE_KEYS.get(key, key))
-
-    def clear_text(self):
-        self.tab1.text1.delete('1.0', tk.END)
+            count += run_headless(
+                sys.stdin, proxy_buffer, translator, config, args.raw)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Whatever ends the capture, queued keys still go out.
+        read = time.time() - start
+        proxy_buffer.flush()
+        elapsed = time.time() - start
+        proxy_buffer.close()
+        config.stop()
+    sys.stderr.write(
+        '%d key events: read %.0f/s, sent %.0f/s; %s\n' % (
+            count, count / max(read, 1e-9), count / max(elapsed, 1e-9),
+            proxy_buffer.metrics.summary()))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Capture dictation and forward it to the aenea server.')
+    parser.add_argument(
+        '--headless', action='store_true',
+        help='read key events instead of opening the capture window')
+    parser.add_argument(
+        '--input', metavar='PATH',
+        help='headless: file or named pipe to read (default: stdin)')
+    parser.add_argument(
+        '--listen', metavar='[HOST:]PORT',
+        help='headless: accept key event streams on a local TCP socket')
+    parser.add_argument(
+        '--raw', action='store_true',
+        help='headless: input is plain text, not one keysym per line')
+    args = parser.parse_args()
+    if args.headless:
+        headless_main(args)
+    else:
+        root = AeneaClient()
+        try:
+            root.mainloop()
+        finally:
+            root.proxy_buffer.close()
 
 if __name__ == '__main__':
-    root = AeneaClient()
-    root.mainloop()
+    main()
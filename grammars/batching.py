@@ -0,0 +1,105 @@
+"""Send every proxy action of one recognition as a single RPC.
+
+Aenea's ProxyKey and ProxyText hand their events to
+aenea.communications.server.execute_batch, one call (and so one network round
+trip) per action. While a batch is open the server is swapped for a collector
+that only records those calls; when the batch closes everything recorded is
+sent, in order, with one execute_batch. Queries such as get_context, whose
+result is needed at once, still go to the server when they are made. This
+only saves round trips when use_multiple_actions is enabled in the client
+config (it is in client_aenea.json); otherwise aenea itself splits the batch
+again.
+"""
+import contextlib
+
+import aenea.communications
+
+import dispatch
+import tracing
+
+
+class _BatchCollector(object):
+
+    """Stands in for aenea.communications.server while a batch is open.
+    Action calls are recorded; queries (get_context, server_info, ...) go
+    straight to server."""
+
+    def __init__(self, server):
+        self.server = server
+        self.commands = []
+        self.calls = 0
+
+    def execute_batch(self, batch):
+        self.calls += 1
+        self.commands.extend(batch)
+
+    def __getattr__(self, meth):
+        if meth.startswith('_'):
+            raise AttributeError(meth)
+        if meth not in dispatch.ACTION_METHODS:
+            return getattr(self.server, meth)
+
+        def call(*args, **kwargs):
+            self.execute_batch([(meth, args, kwargs)])
+        return call
+
+
+class BatchStats(object):
+
+    """Running totals of proxy round trips requested versus sent."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.batches = 0
+        self.requested = 0
+        self.sent = 0
+
+    def record(self, requested, sent):
+        self.batches += 1
+        self.requested += requested
+        self.sent += sent
+
+    @property
+    def saved(self):
+        return self.requested - self.sent
+
+    def report(self):
+        return ('%d recognitions: %d proxy calls sent as %d batches, '
+                '%d round trips saved' % (
+                    self.batches, self.requested, self.sent, self.saved))
+
+stats = BatchStats()
+
+
+@contextlib.contextmanager
+def batched():
+    """
+    Collect proxy calls made inside the block into one execute_batch.
+
+    Nested blocks join the outermost batch. Whatever was collected is sent
+    even if the block raises, since those actions would already have been
+    typed without batching.
+
+    Yields
+    ------
+    _BatchCollector
+        collector recording the calls; ``calls`` is the number of round
+        trips that would have been made without batching
+    """
+    if isinstance(aenea.communications.server, _BatchCollector):
+        yield aenea.communications.server
+        return
+    server = aenea.communications.server
+    collector = _BatchCollector(server)
+    aenea.communications.server = collector
+    try:
+        yield collector
+    finally:
+        aenea.communications.server = server
+        if collector.commands:
+            with tracing.span('execute_batch',
+                              actions=len(collector.commands)):
+                server.execute_batch(collector.commands)
+        stats.record(collector.calls, 1 if collector.commands else 0)
@@ -1,6 +1,14 @@
 """Common values and functions for dragonfly_grammars."""
+import collections
 import string
+
 import aenea
+from dragonfly.actions.action_base import (
+    ActionBase,
+    ActionSeries,
+    BoundAction)
+
+import batching
 
 _GETTEXT_FUNC = lambda text: text
 # pylint: disable=unnecessary-lambda
@@ -21,54 +29,120 @@ def extract_values(node, types, recurse=False):
             matches.extend(extract_values(child, types, True))
     return matches
 
+# Key names of the characters Text types; the rest fall back to
+# _fallback_keyname().
+KEY_NAMES = {
+    '<': 'langle',
+    '{': 'lbrace',
+    '[': 'lbracket',
+    '(': 'lparen',
+    '>': 'rangle',
+    '}': 'rbrace',
+    ']': 'rbracket',
+    ')': 'rparen',
+    '&': 'ampersand',
+    "'": 'apostrophe',
+    '*': 'asterisk',
+    '@': 'at',
+    '\\': 'backslash',
+    '`': 'backtick',
+    '|': 'bar',
+    '^': 'caret',
+    ':': 'colon',
+    ',': 'comma',
+    '$': 'dollar',
+    '.': 'dot',
+    '"': 'dquote',
+    '=': 'equal',
+    '!': 'exclamation',
+    '#': 'hash',
+    '-': 'hyphen',
+    '%': 'percent',
+    '+': 'plus',
+    '?': 'question',
+    ';': 'semicolon',
+    '/': 'slash',
+    '~': 'tilde',
+    '_': 'underscore',
+    ' ': 'space',
+    '\n': 'enter',
+    '\r': 'enter',
+    '\t': 'tab',
+}
+for _character in string.lowercase + string.digits:
+    KEY_NAMES[_character] = _character
+for _character in string.uppercase:
+    KEY_NAMES[_character] = 's-{}'.format(_character)
+
+# Encoded texts kept, least recently used dropped first.
+KEYSTR_CACHE_SIZE = 512
+
+_keystr_cache = collections.OrderedDict()
+
+def _fallback_keyname(character):
+    """Key name for a character missing from KEY_NAMES: its X keysym
+    (U00E9 for e acute), or None for control characters, which are
+    dropped."""
+    if ord(character) < 32 or ord(character) == 127:
+        return None
+    return 'U{:04X}'.format(ord(character))
+
+def _encode(text):
+    if not isinstance(text, basestring):
+        text = str(text)
+    elif isinstance(text, str):
+        try:
+            text.decode('ascii')
+        except UnicodeDecodeError:
+            text = text.decode('utf-8', 'replace')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n')
+    keys = []
+    (last, name, count) = (None, None, 0)
+    for character in text:
+        if character == last:
+            count += 1
+            continue
+        if name is not None:
+            keys.append(name if count == 1 else '{}:{}'.format(name, count))
+        name = KEY_NAMES.get(character) or _fallback_keyname(character)
+        (last, count) = (character, 1)
+    if name is not None:
+        keys.append(name if count == 1 else '{}:{}'.format(name, count))
+    return ','.join(keys)
+
 def text_to_keystr(text):
-    """Translate string to keynames for Key."""
+    """
+    Translate string to keynames for Key.
+
+    Repeated characters become one key with a count ('a:3'). Characters
+    without a key name are sent as their X keysym, and control characters
+    other than line breaks and tab are dropped.
+
+    Parameters
+    ----------
+    text: str or unicode
+        text to be typed
+
+    Raises
+    ------
+    None
+
+    Returns
+    -------
+    str
+        e.g. 's-H,e,l:2,o' for 'Hello'; None if text is None
+    """
     if text is None:
         return None
-    charnames = {
-        '<': 'langle',
-        '{': 'lbrace',
-        '[': 'lbracket',
-        '(': 'lparen',
-        '>': 'rangle',
-        '}': 'rbrace',
-        ']': 'rbracket',
-        ')': 'rparen',
-        '&': 'ampersand',
-        "'": 'apostrophe',
-        '*': 'asterisk',
-        '@': 'at',
-        '\\': 'backslash',
-        '`': 'backtick',
-        '|': 'bar',
-        '^': 'caret',
-        ':': 'colon',
-        ',': 'comma',
-        '$': 'dollar',
-        '.': 'dot',
-        '"': 'dquote',
-        '=': 'equal',
-        '!': 'exclamation',
-        '#': 'hash',
-        '-': 'hyphen',
-        '%': 'percent',
-        '+': 'plus',
-        '?': 'question',
-        ';': 'semicolon',
-        '/': 'slash',
-        '~': 'tilde',
-        '_': 'underscore',
-        ' ': 'space',
-        '\n': 'enter',
-        '\r\n': 'enter',
-        '\t': 'tab',
-    }
-    for character in string.lowercase + string.digits:
-        charnames[character] = character
-    for character in string.uppercase:
-        charnames[character] = 's-{}'.format(character)
-    return ','.join(
-        [charnames[character] for character in str(text)])
+    try:
+        keystr = _keystr_cache.pop(text)
+    except KeyError:
+        keystr = _encode(text)
+        if len(_keystr_cache) >= KEYSTR_CACHE_SIZE:
+            _keystr_cache.popitem(last=False)
+    _keystr_cache[text] = keystr
+    return keystr
 
 class Text(aenea.Text):
 
@@ -87,6 +161,94 @@ class Key(aenea.Key):
     def __str__(self):
         return self._spec
 
+def _static_spec(action):
+    """(kind, spec) of a Key or Text from this module whose spec needs no
+    extras, unwrapping the BoundAction a MappingRule value comes in;
+    (None, None) for anything else."""
+    if isinstance(action, BoundAction):
+        action = action._action
+    if type(action) not in (Key, Text) or action._spec is None or \
+            '%' in action._spec:
+        return (None, None)
+    return ('key' if type(action) is Key else 'text', action._spec)
+
+class ActionSequence(ActionSeries):
+
+    """
+    Flat series of actions, built by appending.
+
+    Appending takes amortised constant time: nested series are flattened
+    into one list, and the specs of adjacent static Key and Text actions
+    from this module are collected into one pending run of keys (Text
+    types through keys anyway), turned into a single Key only when the
+    sequence is executed or looked at. The sequence executes inside one
+    batching.batched() block, so its proxy calls make one round trip.
+
+    Parameters
+    ----------
+    actions: dragonfly.ActionBase
+        initial actions, appended in order
+    """
+
+    def __init__(self, *actions):
+        ActionBase.__init__(self)
+        self._done = []
+        # Key specs of the run of static keys and texts being collected.
+        self._keys = []
+        for action in actions:
+            self.append(action)
+
+    def _flush(self):
+        if self._keys:
+            self._done.append(Key(','.join(self._keys)))
+            del self._keys[:]
+
+    @property
+    def _actions(self):
+        self._flush()
+        return self._done
+
+    @property
+    def _str(self):
+        # Built from the merged actions when looked at, rather than by
+        # _set_str() on every append, so appending stays constant time.
+        return u', '.join(unicode(action)
+                          for action in self.flat_action_list())
+
+    @_str.setter
+    def _str(self, value):
+        # ActionBase.__init__ assigns it; it is derived from the actions.
+        pass
+
+    def append(self, other):
+        if isinstance(other, ActionSequence):
+            other._flush()
+            for action in other._done:
+                self.append(action)
+            return
+        if isinstance(other, ActionSeries) and other.stop_on_failures:
+            for action in other.flat_action_list():
+                self.append(action)
+            return
+        (kind, spec) = _static_spec(other)
+        if kind == 'text':
+            spec = text_to_keystr(spec)
+        if kind is None:
+            self._flush()
+            self._done.append(other)
+        elif spec:
+            self._keys.append(spec)
+
+    def __add__(self, other):
+        return ActionSequence(self, other)
+
+    def _execute(self, data=None):
+        with batching.batched():
+            return ActionSeries._execute(self, data)
+
+    def __str__(self):
+        return '+'.join(str(action) for action in self._actions)
+
 def join_actions(joiner, values):
     """
     Join Action objects with a text.
@@ -112,10 +274,10 @@ def join_actions(joiner, values):
         return
     elif len(values) == 1:
         return values[0]
-    result = values[0]
+    result = ActionSequence(values[0])
     for value in values[1:]:
-        result += Text(joiner)
-        result += value
+        result.append(Text(joiner))
+        result.append(value)
     return result
 
 def sum_actions(actions):
@@ -139,10 +301,7 @@ def sum_actions(actions):
         return None
     elif len(actions) == 1:
         return actions[0]
-    result = actions[0]
-    for action in actions[1:]:
-        result += action
-    return result
+    return ActionSequence(*actions)
 
 def execute_keystr(text):
     """Type out text."""
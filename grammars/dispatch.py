@@ -0,0 +1,196 @@
+"""Ordered asynchronous dispatch of proxy actions.
+
+Without this, a recognition callback returns only once the server has
+acknowledged every keystroke, so Natlink cannot process the next utterance
+until the last one has been typed. AsyncProxy takes the place of
+aenea.communications.server: action calls (execute_batch, key_press,
+write_text, ...) are put on a bounded FIFO queue and the callback returns at
+once, while one worker thread sends them to the real server in order.
+
+Calls whose result is needed (get_context, server_info, ...) wait for
+every queued batch that may change focus (mouse actions, modified keys
+such as alt-tab) to be sent, so get_context never reports the window the
+previous utterance was about to leave. Behind plain typing they wait only
+for the batch on the wire, if any: ProxyAppContext asks for the context
+at the start of every utterance, and waiting there for the previous
+utterance's text to be typed would hold up recognition just as
+synchronous sending did. flush() first when even that matters.
+
+When the queue is full, callers block until the worker catches up; that
+backpressure keeps a stalled server from building an unbounded backlog of
+keystrokes. Grammars call flush() from unload() so nothing queued is lost.
+"""
+import Queue
+import threading
+
+import tracing
+
+# Server methods that only type or move something and return nothing, so
+# they can be queued rather than waited for.
+ACTION_METHODS = frozenset([
+    'execute_batch',
+    'multiple_actions',
+    'key_press',
+    'write_text',
+    'pause',
+    'click_mouse',
+    'move_mouse',
+    ])
+
+# Methods that leave the focused window as it is, and the modifiers a
+# key_press may carry without being read as a window switch.
+TYPING_METHODS = frozenset(['write_text', 'pause'])
+TYPING_MODIFIERS = frozenset(['shift'])
+
+# Keys that act on the desktop rather than the focused window even
+# when pressed alone.
+FOCUS_KEYS = frozenset(['alt', 'super', 'win', 'menu'])
+
+_STOP = object()
+
+
+def may_change_focus(batch):
+    """Whether any action in batch might move focus to another window."""
+    for (meth, args, kwargs) in batch:
+        if meth in TYPING_METHODS:
+            continue
+        if (meth == 'key_press' and not args
+                and kwargs.get('key') not in FOCUS_KEYS
+                and TYPING_MODIFIERS.issuperset(
+                    kwargs.get('modifiers') or ())):
+            continue
+        return True
+    return False
+
+
+class AsyncProxy(object):
+
+    """
+    FIFO, bounded, single-worker front for a proxy server.
+
+    Parameters
+    ----------
+    server: object
+        what calls are finally sent to (aenea.communications.Proxy)
+    depth: int
+        number of queued batches after which callers block
+    """
+
+    def __init__(self, server, depth=32):
+        self.server = server
+        self.depth = depth
+        self.max_depth_seen = 0
+        self.sent = 0
+        self._queue = Queue.Queue(maxsize=depth)
+        # Held while a call is on the wire; aenea's jsonrpclib proxy is
+        # not safe to use from two threads at once.
+        self._sending = threading.Lock()
+        # Taken before _sending; a waiting query holds it so the worker
+        # cannot start the next batch ahead of it.
+        self._turn = threading.Lock()
+        # Number of queued batches that may change focus; queries wait
+        # for it to reach zero.
+        self._focus_pending = 0
+        self._focus_sent = threading.Condition()
+        self._worker = threading.Thread(target=self._work)
+        self._worker.daemon = True
+        self._worker.start()
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                batch, changes_focus = item
+                with tracing.span('proxy send', actions=len(batch)):
+                    with self._turn:
+                        self._sending.acquire()
+                    try:
+                        self.server.execute_batch(batch)
+                    finally:
+                        self._sending.release()
+                self.sent += 1
+            except Exception as error:
+                print 'Error sending queued actions: %r' % error
+            finally:
+                if item is not _STOP and changes_focus:
+                    with self._focus_sent:
+                        self._focus_pending -= 1
+                        self._focus_sent.notify_all()
+                self._queue.task_done()
+
+    def execute_batch(self, batch):
+        """Queue batch for sending; blocks while the queue is full."""
+        if not batch:
+            return
+        batch = list(batch)
+        changes_focus = may_change_focus(batch)
+        if changes_focus:
+            with self._focus_sent:
+                self._focus_pending += 1
+        self._queue.put((batch, changes_focus))
+        self.max_depth_seen = max(self.max_depth_seen, self._queue.qsize())
+
+    def __getattr__(self, meth):
+        if meth.startswith('_'):
+            raise AttributeError(meth)
+        if meth in ACTION_METHODS:
+            def call(*args, **kwargs):
+                self.execute_batch([(meth, args, kwargs)])
+        else:
+            def call(*args, **kwargs):
+                with self._focus_sent:
+                    while self._focus_pending:
+                        self._focus_sent.wait()
+                with self._turn, self._sending:
+                    return getattr(self.server, meth)(*args, **kwargs)
+        return call
+
+    @property
+    def pending(self):
+        return self._queue.unfinished_tasks
+
+    def flush(self):
+        """Block until everything queued so far has been sent."""
+        self._queue.join()
+
+    def stop(self):
+        """Send what is queued, then end the worker thread."""
+        self._queue.put(_STOP)
+        self._worker.join()
+
+
+_installed = None
+
+
+def install(depth=32):
+    """Put an AsyncProxy in front of aenea.communications.server. Only the
+    first call installs; later ones return the same proxy."""
+    global _installed
+    if _installed is not None:
+        return _installed
+    import aenea.communications
+
+    _installed = AsyncProxy(aenea.communications.server, depth=depth)
+    aenea.communications.server = _installed
+    return _installed
+
+
+def flush():
+    """Wait for queued actions to be sent; no-op when not installed."""
+    if _installed is not None:
+        _installed.flush()
+
+
+def uninstall():
+    """Drain and stop the queue and restore the server it wrapped."""
+    global _installed
+    if _installed is None:
+        return
+    import aenea.communications
+
+    _installed.stop()
+    if aenea.communications.server is _installed:
+        aenea.communications.server = _installed.server
+    _installed = None
@@ -0,0 +1,202 @@
+"""Formatters for dictated identifiers, shared by the grammars.
+
+FORMATTERS maps each spoken style name ('camel', 'rel-path', ...) to the
+function that formats a list of words in that style. It is built once at
+import; register() adds to it. A grammar offers a style by putting its
+spoken name in a spec, and format_words() turns the words of a recognition
+into text:
+
+    format_words(['upper', 'score', 'read\\read', 'table'])  # 'READ_TABLE'
+
+Dragon reports dictated words as "written\\spoken"; tokenize() keeps the
+written form, drops hyphens and applies the requested case in one pass
+over the words.
+"""
+import spoken_numbers
+
+
+def format_snakeword(text):
+    formatted = text[0][0].upper()
+    formatted += text[0][1:]
+    formatted += ('_' if len(text) > 1 else '')
+    formatted += format_score(text[1:])
+    return formatted
+
+
+def format_score(text):
+    return '_'.join(text)
+
+
+def format_eelword(text):
+    return '_'.join(text)
+
+
+def format_camero(textnum):
+    return spoken_numbers.digits(textnum)
+
+
+def format_acronym(text):
+    return ''.join([word.upper() for word in text])
+
+
+def format_camel(text):
+    return text[0] + ''.join([word[0].upper() + word[1:] for word in text[1:]])
+
+
+def format_proper(text):
+    return ''.join(word.capitalize() for word in text)
+
+
+def format_relpath(text):
+    return '/'.join(text)
+
+
+def format_abspath(text):
+    return '/' + format_relpath(text)
+
+
+def format_scoperesolve(text):
+    return '::'.join(text)
+
+
+def format_jumble(text):
+    return ''.join(text)
+
+
+def format_dotword(text):
+    return '.'.join(text)
+
+
+def format_dashword(text):
+    return '-'.join(text)
+
+
+def format_natword(text):
+    return ' '.join(text)
+
+
+def format_lowercase(text):
+    return ' '.join([word.lower() for word in text])
+def format_uppercase(text):
+    return ' '.join([word.upper() for word in text])
+def format_stringsequence(text):
+    return "'" + "', '".join(text) + "'"
+def format_superstringsequence(text):
+    return '"' + '", "'.join(text) + '"'
+def format_commasequence(text):
+    return ', '.join(text)
+
+
+def format_broodingnarrative(text):
+    return ''
+
+
+def format_sentence(text):
+    return ' '.join([text[0].capitalize()] + text[1:])
+
+
+def format_snakecase(text):
+    return '_'.join(word.lower() for word in text)
+
+
+def format_mixedcase(text):
+    return ''.join([text[0].lower()] +
+                   [word.lower().capitalize() for word in text[1:]])
+
+
+def format_upperscore(text):
+    return '_'.join(word.upper() for word in text)
+
+
+def format_dictate(text):
+    return ' '.join(text)
+
+
+FORMATTERS = {
+    'abs-path': format_abspath,
+    'acronym': format_acronym,
+    'brooding-narrative': format_broodingnarrative,
+    'camel': format_camel,
+    'camero': format_camero,
+    'comma-sequence': format_commasequence,
+    'dashword': format_dashword,
+    'dotword': format_dotword,
+    'eelword': format_eelword,
+    'jumble': format_jumble,
+    'lowercase': format_lowercase,
+    'natword': format_natword,
+    'proper': format_proper,
+    'rel-path': format_relpath,
+    'scope-resolve': format_scoperesolve,
+    'score': format_score,
+    'sentence': format_sentence,
+    'snakeword': format_snakeword,
+    'string-sequence': format_stringsequence,
+    'superstring-sequence': format_superstringsequence,
+    'uppercase': format_uppercase,
+    # Styles that format the words' case themselves, for dictation that
+    # is not cased by tokenize().
+    'snake-case': format_snakecase,
+    'mixed-case': format_mixedcase,
+    'upper-score': format_upperscore,
+    'dictate': format_dictate,
+    }
+
+# Words before the style name that set the case of the dictated words;
+# without one they are lowercased.
+CASE_PREFIXES = {
+    'upper': 'upper',
+    'natural': None,
+    }
+
+
+def _token(word):
+    """Written form of a Dragon word, without hyphens."""
+    return word.split('\\', 1)[0].replace('-', '')
+
+
+_BY_TOKEN = dict((_token(spoken), function)
+                 for (spoken, function) in FORMATTERS.iteritems())
+
+
+def register(spoken, function):
+    """Offer function as the style spoken."""
+    FORMATTERS[spoken] = function
+    _BY_TOKEN[_token(spoken)] = function
+
+
+def unknown(styles):
+    """Names in styles that no formatter is registered for."""
+    return [spoken for spoken in styles if spoken not in FORMATTERS]
+
+
+def tokenize(words, case='lower'):
+    """Written forms of words without hyphens, in case 'lower', 'upper' or
+    None to leave them as dictated."""
+    if case == 'lower':
+        return [_token(word).lower() for word in words]
+    if case == 'upper':
+        return [_token(word).upper() for word in words]
+    return [_token(word) for word in words]
+
+
+def format_words(words):
+    """
+    Format the words of a "[upper | natural] <style> [<dictation>]"
+    recognition.
+
+    Parameters
+    ----------
+    words: list of str
+        as from node.words()
+
+    Returns
+    -------
+    str
+    """
+    case = 'lower'
+    if words[0] in CASE_PREFIXES:
+        case = CASE_PREFIXES[words[0]]
+        words = words[1:]
+    function = _BY_TOKEN[_token(words[0]).lower()]
+    return function(tokenize(words[1:], case))
@@ -24,6 +24,8 @@ from common import (
     Key,
     sum_actions)
 
+import formatting
+
 from aenea.proxy_contexts import ProxyAppContext
 general_context = aenea.wrappers.AeneaContext(
     ProxyAppContext(match='regex', title='(?i).*LibreOffice.*'),
@@ -260,7 +262,7 @@ class DictationRule(CompoundRule):
 
     """Different formattings of dictated text."""
 
-    default_formatting = 'snake'
+    default_formatting = 'snake-case'
 
     def __init__(
             self,
@@ -270,7 +272,7 @@ class DictationRule(CompoundRule):
             defaults=None,
             exported=False,
             context=None,
-            default_formatting='snake'):
+            default_formatting='snake-case'):
         if exported is not None:
             self.exported = exported
         if self.exported:
@@ -280,13 +282,13 @@ class DictationRule(CompoundRule):
             self.spec = "[<formatting>] <dictation>"
         self.extras = [
             Choice(name='formatting', choices={
-                _("snake [case]"): "snake",  # snake_case
-                _("camel [case]"): "camel",  # CamelCase
-                _("mixed [case]"): "mixed",  # mixedCase
-                _("upper[case]"): "upper",  # UPPERCASE_STUFF
-                _("no case"): "nocase",  # lowercase text
+                _("snake [case]"): "snake-case",  # snake_case
+                _("camel [case]"): "proper",  # CamelCase
+                _("mixed [case]"): "mixed-case",  # mixedCase
+                _("upper[case]"): "upper-score",  # UPPERCASE_STUFF
+                _("no case"): "lowercase",  # lowercase text
                 _("sentence"): "sentence",  # Cap first letter
-                _("dictate"): "raw",  # raw dictation
+                _("dictate"): "dictate",  # raw dictation
                 }),
             Dictation(name='dictation'),
             ]
@@ -300,46 +302,17 @@ class DictationRule(CompoundRule):
             context=context)
 
     def value(self, node):
-        formatting = self.default_formatting
+        style = self.default_formatting
         if node.has_child_with_name('formatting'):
-            formatting = node.get_child_by_name(
+            style = node.get_child_by_name(
                 'formatting').value()
         raw_dictation = str(node.get_child_by_name(
             'dictation').value())
-        joiner = ' '
         words = raw_dictation.split(' ')
-        formatted_tokens = []
-        if formatting == 'snake':
-            joiner = '_'
-            for word in words:
-                formatted_tokens.append(word.lower())
-        elif formatting == 'camel':
-            joiner = ''
-            for word in words:
-                formatted_tokens.append(word.lower().capitalize())
-        elif formatting == 'mixed':
-            joiner = ''
-            formatted_tokens.append(words[0].lower())
-            if len(words) > 1:
-                for word in words[1:]:
-                    formatted_tokens.append(word.lower().capitalize())
-        elif formatting == 'upper':
-            joiner = '_'
-            for word in words:
-                formatted_tokens.append(word.upper())
-        elif formatting == 'nocase':
-            for word in words:
-                formatted_tokens.append(word.lower())
-        elif formatting == 'sentence':
-            joiner = ' '
-            formatted_tokens.extend(words)
-            formatted_tokens[0].capitalize()
-        elif formatting == 'raw':
-            formatted_tokens.extend(words)
-        else:
-            print "unknown formatting: %s" % formatting
-
-        return Text(joiner.join(formatted_tokens))
+        if style not in formatting.FORMATTERS:
+            print "unknown formatting: %s" % style
+            return Text('')
+        return Text(formatting.FORMATTERS[style](words))
 
     def _process_recognition(self, node, extras):
         self.value(node).execute()
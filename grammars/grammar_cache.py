@@ -0,0 +1,245 @@
+"""On-disk cache of what the grammar modules compile every time Dragon
+starts.
+
+On each start dragonfly's NatlinkCompiler walks each grammar's rule graph
+and serializes it into the binary grammar Natlink loads, from unchanged
+sources.
+
+The result is kept under CACHE_DIR. Each entry is keyed by a hash of the
+source of the modules that produced it, the files under the aenea
+vocabulary and grammar_config directories (static vocabulary and the
+spoken forms make_grammar_commands reads become part of the grammars) and
+the dragonfly version, so editing a grammar, a vocabulary or a grammar
+config file misses the cache and the result is compiled afresh.
+
+install() puts the Natlink cache in place; a grammar takes part once
+track(grammar, modules) has named the modules it is built from. Entries
+are written by flush(), which vim_core calls after loading its grammars and
+which also runs at exit.
+
+benchmarks/startup_time.py measures startup with and without the cache.
+"""
+import atexit
+import cPickle as pickle
+import hashlib
+import os
+import tempfile
+
+import tracing
+
+ENABLED = True
+
+CACHE_DIR = os.path.join(tempfile.gettempdir(), 'aenea_grammar_cache')
+
+# Directory of the aenea vocabulary files; None means
+# aenea.config.PROJECT_ROOT/vocabulary_config.
+VOCABULARY_DIR = None
+
+# Directory of the JSON files aenea.configuration.make_grammar_commands
+# reads spoken forms from; None means aenea.config.PROJECT_ROOT/grammar_config.
+GRAMMAR_CONFIG_DIR = None
+
+# Bump to drop every cache written by an older layout.
+FORMAT = 1
+
+
+def _source_path(module):
+    path = getattr(module, '__file__', None)
+    if path is None:
+        return None
+    if path.endswith(('.pyc', '.pyo')):
+        path = path[:-1]
+    return path
+
+
+def _config_dir(configured, name):
+    if configured is not None:
+        return configured
+    try:
+        import aenea.config
+    except ImportError:
+        return None
+    root = getattr(aenea.config, 'PROJECT_ROOT', None)
+    if root is None:
+        return None
+    return os.path.join(root, name)
+
+
+def _update_with_file(digest, path):
+    digest.update(path)
+    try:
+        with open(path, 'rb') as source:
+            digest.update(source.read())
+    except IOError:
+        digest.update('<missing>')
+
+
+def source_key(modules, *extra):
+    """
+    Hash identifying the output compiled from modules.
+
+    Parameters
+    ----------
+    modules: list of module
+        modules whose source the output depends on
+    extra: str
+        anything else the output depends on, e.g. a grammar name
+
+    Returns
+    -------
+    str
+        hex digest over the modules' sources, the vocabulary and grammar
+        config files, the dragonfly version, FORMAT and extra
+    """
+    digest = hashlib.sha1()
+    digest.update(str(FORMAT))
+    for path in sorted(filter(None, map(_source_path, modules))):
+        _update_with_file(digest, path)
+    for config in (_config_dir(VOCABULARY_DIR, 'vocabulary_config'),
+                   _config_dir(GRAMMAR_CONFIG_DIR, 'grammar_config')):
+        if not (config and os.path.isdir(config)):
+            continue
+        for (directory, subdirectories, files) in os.walk(config):
+            subdirectories.sort()
+            for name in sorted(files):
+                _update_with_file(digest, os.path.join(directory, name))
+    try:
+        import dragonfly
+        digest.update(getattr(dragonfly, '__version__', ''))
+    except ImportError:
+        pass
+    for value in extra:
+        digest.update(value)
+    return digest.hexdigest()
+
+
+class Entry(object):
+
+    """
+    One cache file holding a dict computed from sources hashing to key.
+
+    The file is read on first use; if it was written for another key it
+    is ignored and overwritten by the next save().
+
+    Parameters
+    ----------
+    name: str
+        file name under CACHE_DIR
+    key: str
+        source_key() of what the values are compiled from
+    """
+
+    def __init__(self, name, key):
+        self.name = name
+        self.key = key
+        self._values = None
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def path(self):
+        return os.path.join(CACHE_DIR, self.name)
+
+    @property
+    def values(self):
+        if self._values is None:
+            self._values = {}
+            if ENABLED:
+                self._values = self._read()
+        return self._values
+
+    def _read(self):
+        try:
+            with open(self.path, 'rb') as stored:
+                (key, values) = pickle.load(stored)
+        except (IOError, EOFError, ValueError, TypeError,
+                pickle.UnpicklingError):
+            return {}
+        return values if key == self.key else {}
+
+    def get(self, name, compute):
+        """values[name], computing and storing it on a miss."""
+        values = self.values
+        try:
+            value = values[name]
+        except KeyError:
+            self.misses += 1
+            value = values[name] = compute()
+            self.dirty = True
+        else:
+            self.hits += 1
+        return value
+
+    def save(self):
+        """Write the values if anything was added since they were read."""
+        if not (ENABLED and self.dirty):
+            return
+        if not os.path.isdir(CACHE_DIR):
+            os.makedirs(CACHE_DIR)
+        # Write then rename, so a Dragon killed mid-write leaves the old
+        # file or none rather than a truncated one.
+        (handle, temporary) = tempfile.mkstemp(dir=CACHE_DIR)
+        with os.fdopen(handle, 'wb') as stored:
+            pickle.dump((self.key, self._values), stored,
+                        pickle.HIGHEST_PROTOCOL)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        os.rename(temporary, self.path)
+        self.dirty = False
+
+_entries = {}
+
+
+def entry(name, key):
+    """The Entry called name, replaced if key has changed."""
+    current = _entries.get(name)
+    if current is None or current.key != key:
+        current = _entries[name] = Entry(name, key)
+    return current
+
+
+def flush():
+    """Save every entry that has new values."""
+    with tracing.span('grammar_cache.flush'):
+        for current in _entries.values():
+            try:
+                current.save()
+            except (IOError, OSError) as error:
+                print 'grammar_cache: could not write %s: %s' % (
+                    current.path, error)
+
+atexit.register(flush)
+
+
+def track(grammar, modules):
+    """Cache grammar's compiled Natlink form, keyed by the source of
+    modules and its rules."""
+    grammar.cache_key = source_key(modules, grammar.name, *[
+        '%s:%d' % (rule.name, bool(rule.exported)) for rule in grammar.rules])
+
+
+def _safe_name(name):
+    return ''.join(char if char.isalnum() else '_' for char in name)
+
+
+def install():
+    """Cache NatlinkCompiler.compile_grammar for tracked grammars.
+    Does nothing where dragonfly's Natlink backend is not available."""
+    try:
+        from dragonfly.engines.backend_natlink.compiler import NatlinkCompiler
+    except ImportError:
+        return
+    compile_grammar = NatlinkCompiler.compile_grammar
+    if getattr(compile_grammar, 'cached', False):
+        return
+
+    def cached_compile_grammar(self, grammar):
+        key = getattr(grammar, 'cache_key', None)
+        if key is None or not ENABLED:
+            return compile_grammar(self, grammar)
+        stored = entry('natlink-%s' % _safe_name(grammar.name), key)
+        with tracing.span('compile_grammar', grammar=grammar.name):
+            return stored.get(key, lambda: compile_grammar(self, grammar))
+    cached_compile_grammar.cached = True
+    NatlinkCompiler.compile_grammar = cached_compile_grammar
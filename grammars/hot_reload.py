@@ -0,0 +1,177 @@
+"""Reload edited grammar modules without restarting Dragon.
+
+A Reloader remembers the modification time of every loaded module whose
+source is in grammars/. check() reloads those whose file has changed since:
+
+* an overlay module (one that registers a vim_core.VimOverlay) is simply
+  executed again; its register() call replaces the old overlay and the
+  shared grammar is rebuilt at once. vim_core carries over every rule
+  whose mapping is unchanged and the dynamic vocabulary lists, so only
+  the edited mappings are built again; the whole 'vim' grammar is still
+  unloaded, compiled and loaded again;
+* any other grammar module is unloaded with its unload(), executed again
+  and, if it registers its grammar from a load() function, loaded.
+
+Helper modules (RESTART_MODULES) are referenced from every grammar, so a
+change to one of them is only reported.
+
+If executing the new source fails, the traceback is printed and an overlay
+module keeps its old overlay, since register() is never reached. The file
+is not retried until it changes again.
+
+_hot_reload.py calls check() at the start of each utterance. It passes
+the utterance's (executable, title, handle) along, so that a grammar
+loaded by the reload has its context evaluated for that utterance too,
+having missed its own process_begin.
+"""
+import os
+import sys
+import time
+import traceback
+
+import tracing
+
+ENABLED = True
+
+GRAMMAR_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules whose changes need the grammars loaded afresh.
+RESTART_MODULES = frozenset([
+    'action_compiler',
+    'batching',
+    'dispatch',
+    'grammar_cache',
+    'hot_reload',
+    'lazy_grammar',
+    'recorder',
+    'tracing',
+    'vim_core',
+    ])
+
+# Natlink's own grammar modules, which it loads and reloads itself.
+IGNORED_MODULES = frozenset(['_hot_reload'])
+
+# Seconds between two looks at the files; utterances in between do not
+# stat anything.
+CHECK_INTERVAL = 1.0
+
+
+def _source_path(module):
+    path = getattr(module, '__file__', None)
+    if path is None:
+        return None
+    if path.endswith(('.pyc', '.pyo')):
+        path = path[:-1]
+    return os.path.abspath(path)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class Reloader(object):
+
+    """
+    Reloads the changed modules of one directory.
+
+    Parameters
+    ----------
+    directory: str
+        modules whose source is here are watched
+    interval: float
+        minimum seconds between two checks
+    clock: callable
+        time source, in seconds
+    """
+
+    def __init__(self, directory=GRAMMAR_DIR, interval=CHECK_INTERVAL,
+                 clock=time.time):
+        self.directory = os.path.abspath(directory)
+        self.interval = interval
+        self.clock = clock
+        self._mtimes = {}
+        self._checked = None
+        self.snapshot()
+
+    def watched(self):
+        """{name: source path} of the loaded modules in directory."""
+        found = {}
+        for (name, module) in sys.modules.items():
+            if module is None or name in IGNORED_MODULES:
+                continue
+            path = _source_path(module)
+            if path is not None and os.path.dirname(path) == self.directory:
+                found[name] = path
+        return found
+
+    def snapshot(self):
+        """Take the current files as unchanged."""
+        self._mtimes = dict((name, _mtime(path))
+                            for (name, path) in self.watched().iteritems())
+
+    def changed(self):
+        """Names of watched modules whose file changed since it was last
+        seen; newly imported modules are only remembered."""
+        found = []
+        for (name, path) in self.watched().iteritems():
+            mtime = _mtime(path)
+            if name not in self._mtimes:
+                self._mtimes[name] = mtime
+            elif mtime != self._mtimes[name]:
+                self._mtimes[name] = mtime
+                found.append(name)
+        return sorted(found)
+
+    def check(self, force=False, window=None):
+        """Reload changed modules, at most once per interval unless force.
+        window is the (executable, title, handle) of the utterance under
+        way, if any. Returns the names reloaded."""
+        now = self.clock()
+        if not force and self._checked is not None and \
+                now - self._checked < self.interval:
+            return []
+        self._checked = now
+        return [name for name in self.changed()
+                if self.reload(name, window)]
+
+    def reload(self, name, window=None):
+        """Reload module name; returns whether it was reloaded. See check()
+        for window."""
+        if name in RESTART_MODULES:
+            print 'hot_reload: %s changed; reload the grammars to use it' % (
+                name)
+            return False
+        module = sys.modules[name]
+        start = self.clock()
+        try:
+            with tracing.span('hot_reload', module=name):
+                if hasattr(module, 'overlay'):
+                    import vim_core
+                    reload(module)
+                    vim_core.load_pending(window)
+                else:
+                    if hasattr(module, 'unload'):
+                        module.unload()
+                    reload(module)
+                    if hasattr(module, 'load'):
+                        module.load()
+                    grammar = getattr(module, 'grammar', None)
+                    if window is not None and grammar is not None and \
+                            grammar.loaded:
+                        grammar.process_begin(*window)
+        except Exception:
+            print 'hot_reload: reloading %s failed:' % name
+            traceback.print_exc()
+            return False
+        elapsed = 1e3 * (self.clock() - start)
+        if hasattr(module, 'overlay'):
+            import vim_core
+            build = vim_core.last_build
+            print 'hot_reload: reloaded %s in %.1fms (%d rules built, ' \
+                '%d reused)' % (name, elapsed, build.built, build.reused)
+        else:
+            print 'hot_reload: reloaded %s in %.1fms' % (name, elapsed)
+        return True
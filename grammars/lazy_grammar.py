@@ -0,0 +1,109 @@
+"""Grammars built and loaded with the engine only when first needed.
+
+Some grammars are only used now and then; the ExMode command grammars, for
+example, are only active between "execute" and "kay". Building and loading
+them at import costs startup time and keeps them resident in Dragon for the
+whole session. A LazyGrammar holds the function that builds and loads such
+a grammar instead, and runs it the first time get() is called. Once loaded,
+the grammar is unloaded again when it has been disabled and unused for
+idle_timeout seconds; the next get() builds it afresh.
+
+Loading and unloading must happen on the engine's thread, so nothing here
+runs on a timer: watch(grammar, lazy) makes a resident grammar check its
+lazy grammars for idleness at the start of every utterance, as
+process_begin is called.
+"""
+import time
+
+import tracing
+
+# Seconds a loaded, disabled grammar may go unused before it is unloaded;
+# None keeps it loaded once built.
+IDLE_TIMEOUT = 300.0
+
+
+class LazyGrammar(object):
+
+    """
+    A grammar that is built on first use and unloaded when idle.
+
+    Parameters
+    ----------
+    name: str
+        for tracing spans
+    build: callable
+        builds, loads and returns the grammar
+    idle_timeout: float or None
+        seconds a disabled grammar may go unused before it is unloaded
+    clock: callable
+        time source, in seconds
+    """
+
+    def __init__(self, name, build, idle_timeout=IDLE_TIMEOUT,
+                 clock=time.time):
+        self.name = name
+        self.build = build
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self.grammar = None
+        self.last_used = None
+        self.loads = 0
+
+    @property
+    def loaded(self):
+        return self.grammar is not None
+
+    def get(self):
+        """The grammar, built and loaded if it is not."""
+        if self.grammar is None:
+            with tracing.span('lazy_grammar.load', grammar=self.name):
+                self.grammar = self.build()
+            self.loads += 1
+        self.touch()
+        return self.grammar
+
+    def touch(self):
+        """Note that the grammar is in use now."""
+        self.last_used = self.clock()
+
+    def idle(self):
+        """Whether the grammar is loaded but disabled and unused for longer
+        than idle_timeout."""
+        if self.grammar is None or self.idle_timeout is None:
+            return False
+        if self.grammar.enabled:
+            return False
+        return self.clock() - self.last_used > self.idle_timeout
+
+    def unload(self):
+        if self.grammar is not None:
+            self.grammar.unload()
+        self.grammar = None
+
+    def unload_if_idle(self):
+        if self.idle():
+            with tracing.span('lazy_grammar.unload', grammar=self.name):
+                self.unload()
+
+
+def watch(grammar, lazy, on_begin=None):
+    """
+    Check lazy grammars for idleness whenever grammar begins an utterance.
+
+    Parameters
+    ----------
+    grammar: dragonfly.Grammar
+        a resident grammar; its process_begin is wrapped
+    lazy: list of LazyGrammar
+    on_begin: callable or None
+        also called with (executable, title, handle) at every utterance
+    """
+    process_begin = grammar.process_begin
+
+    def watched_begin(executable, title, handle):
+        for each in lazy:
+            each.unload_if_idle()
+        if on_begin is not None:
+            on_begin(executable, title, handle)
+        return process_begin(executable, title, handle)
+    grammar.process_begin = watched_begin
@@ -0,0 +1,198 @@
+"""Record recognitions to an append-only log for later offline replay.
+
+A Recorder wraps process_begin and the rules' _process_recognition on a
+loaded grammar. Each recognition is written as one line of compact JSON:
+
+    {"k": "rec", "t": start time, "g": grammar, "m": module, "r": rule,
+     "w": [words], "x": {plain extras}, "a": [[method, args, kwargs]],
+     "d": seconds in _process_recognition}
+
+and every change of foreground window seen by process_begin as
+
+    {"k": "begin", "t": time, "g": grammar, "e": executable, "title": title}
+
+"a" holds the proxy actions the recognition produced, in order, as they
+were handed to aenea.communications.server. benchmarks/replay_recognitions.py
+feeds a log back through the grammars and compares those actions.
+
+Recording is off unless RECORD_PATH is set; grammars call attach() after
+loading and it does nothing otherwise.
+"""
+import functools
+import json
+import threading
+import time
+
+import aenea.communications
+
+# Log file recognitions are appended to, or None to not record. The file
+# is only ever appended to; rotate it by moving it away between sessions.
+RECORD_PATH = None
+
+# Extras are logged only if they are of these types; actions, nodes and
+# the like would not round-trip through JSON.
+PLAIN_TYPES = (int, long, float, bool, basestring, type(None))
+
+
+class RecognitionLog(object):
+
+    """Appends records to a file as JSON lines, flushing each one."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'ab')
+
+    def write(self, record):
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def read_log(path):
+    """Yield the records of a log written by RecognitionLog, skipping a
+    truncated last line."""
+    with open(path, 'rb') as lines:
+        for line in lines:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def plain_extras(extras):
+    """The extras of a recognition that can be logged as they are."""
+    return dict((name, value) for (name, value) in extras.iteritems()
+                if not name.startswith('_')
+                and isinstance(value, PLAIN_TYPES))
+
+
+class _ActionTap(object):
+
+    """Stands in for aenea.communications.server during a recognition,
+    noting every action passed on to the real server."""
+
+    def __init__(self, server):
+        self.server = server
+        self.actions = []
+
+    def execute_batch(self, batch):
+        self.actions.extend([method, list(args), kwargs]
+                            for (method, args, kwargs) in batch)
+        return self.server.execute_batch(batch)
+
+    def __getattr__(self, meth):
+        if meth.startswith('_'):
+            raise AttributeError(meth)
+        return getattr(self.server, meth)
+
+
+class Recorder(object):
+
+    """
+    Writes the recognitions of attached grammars to log.
+
+    Parameters
+    ----------
+    log: object
+        anything with a write(record) method, usually a RecognitionLog
+    clock: callable
+        time source, in seconds
+    """
+
+    def __init__(self, log, clock=time.time):
+        self.log = log
+        self.clock = clock
+        self._window = None
+        self._attached = []
+
+    def attach(self, grammar):
+        """Start recording grammar's recognitions. Only exported rules are
+        recognised, so only they are wrapped; a rule already wrapped, as
+        rules reused by a rebuilt grammar are, is left as it is."""
+        self._wrap(grammar, 'process_begin', self._begin_hook(grammar))
+        for rule in grammar.rules:
+            if rule.exported and hasattr(rule, '_process_recognition'):
+                self._wrap(rule, '_process_recognition',
+                           self._recognition_hook(grammar, rule))
+
+    def detach(self):
+        """Stop recording every grammar attach() was given."""
+        for (target, attribute) in self._attached:
+            delattr(target, attribute)
+        self._attached = []
+
+    def _wrap(self, target, attribute, make_hook):
+        original = getattr(target, attribute)
+        if getattr(original, 'recorded', False):
+            return
+        # update_wrapper() also carries over the marks of other wrappers,
+        # such as tracing's, so neither wraps the other again.
+        hook = functools.update_wrapper(make_hook(original), original)
+        hook.recorded = True
+        setattr(target, attribute, hook)
+        if (target, attribute) not in self._attached:
+            self._attached.append((target, attribute))
+
+    def _begin_hook(self, grammar):
+        def make(original):
+            def process_begin(executable, title, handle):
+                if (executable, title) != self._window:
+                    self._window = (executable, title)
+                    self.log.write({'k': 'begin', 't': self.clock(),
+                                    'g': grammar.name, 'e': executable,
+                                    'title': title})
+                return original(executable, title, handle)
+            return process_begin
+        return make
+
+    def _recognition_hook(self, grammar, rule):
+        module = getattr(rule, 'module', type(rule).__module__)
+
+        def make(original):
+            def _process_recognition(node, extras):
+                tap = _ActionTap(aenea.communications.server)
+                aenea.communications.server = tap
+                start = self.clock()
+                try:
+                    return original(node, extras)
+                finally:
+                    elapsed = self.clock() - start
+                    if aenea.communications.server is tap:
+                        aenea.communications.server = tap.server
+                    self.log.write({
+                        'k': 'rec', 't': start, 'g': grammar.name,
+                        'm': module, 'r': rule.name,
+                        'w': list(node.words()),
+                        'x': plain_extras(extras),
+                        'a': tap.actions, 'd': elapsed})
+            return _process_recognition
+        return make
+
+
+_recorder = None
+
+
+def attach(grammar):
+    """Record grammar's recognitions to RECORD_PATH; no-op if it is None."""
+    global _recorder
+    if RECORD_PATH is None:
+        return
+    if _recorder is None:
+        _recorder = Recorder(RecognitionLog(RECORD_PATH))
+    _recorder.attach(grammar)
+
+
+def detach():
+    """Stop recording and close the log."""
+    global _recorder
+    if _recorder is None:
+        return
+    _recorder.detach()
+    _recorder.log.close()
+    _recorder = None
@@ -0,0 +1,234 @@
+"""Spoken numbers to digits.
+
+    digits(['twenty', 'five'])                    # '25'
+    digits(['four', 'two'])                       # '42'
+    digits(['nineteen', 'eighty', 'four'])        # '1984'
+    digits(['two', 'thousand', 'and', 'five'])    # '2005'
+    digits(['minus', 'three', 'point', 'one', 'four'])  # '-3.14'
+
+Words are read left to right into groups. A word joins the current group
+when it can extend it as a number is normally said ("twenty" then "five",
+"three" then "hundred", "thousand" then "two"); otherwise the group is
+written out and the word starts the next one. So digit strings ("four
+two") and years ("nineteen eighty four") come out as they are said.
+"point" writes a decimal point, and "minus" or "negative" first makes the
+number negative. A word that is not part of a number comes out as '?'.
+
+parse() is the strict form for grammars: it returns None rather than
+guess at a phrase that is not a well-formed number, such as a lone
+"and", "one million thousand" or "three point".
+
+The word tables are built once at import and results are memoized per
+phrase, since grammars see the same few numbers over and over.
+"""
+
+UNITS = [
+    'zero', 'one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight',
+    'nine', 'ten', 'eleven', 'twelve', 'thirteen', 'fourteen', 'fifteen',
+    'sixteen', 'seventeen', 'eighteen', 'nineteen',
+    ]
+
+TENS = ['twenty', 'thirty', 'forty', 'fifty', 'sixty', 'seventy', 'eighty',
+        'ninety']
+
+SCALES = {
+    'thousand': 10 ** 3,
+    'million': 10 ** 6,
+    'billion': 10 ** 9,
+    }
+
+# Other words for small numbers.
+ALIASES = {
+    'oh': 0,
+    'dose': 2,
+    }
+
+POINT_WORDS = frozenset(['point'])
+NEGATIVE_WORDS = frozenset(['minus', 'negative'])
+# Ignored inside a number: "one hundred and five".
+FILLER_WORDS = frozenset(['and'])
+# Words that can only start the first group of a phrase: "thousand" alone
+# is 1000, but "one million thousand" is not a number.
+LEADING_WORDS = frozenset(['hundred'] + list(SCALES))
+
+# Phrases memoized before the memo is cleared.
+MAX_MEMO = 10000
+
+_SMALL = dict((word, value) for (value, word) in enumerate(UNITS))
+_SMALL.update(ALIASES)
+_TENS = dict((word, 10 * (index + 2)) for (index, word) in enumerate(TENS))
+
+# Every word digits() understands, e.g. for a grammar's choice of words.
+WORDS = frozenset(list(_SMALL) + list(_TENS) + list(SCALES) + ['hundred'] +
+                  list(POINT_WORDS | NEGATIVE_WORDS | FILLER_WORDS))
+
+_memo = {}
+# parse() results, apart from digits() ones: the same words may be both.
+_strict_memo = {}
+
+
+class _Group(object):
+
+    """One number being said: total of finished scales plus current."""
+
+    __slots__ = ('total', 'current', 'last', 'scale')
+
+    def __init__(self):
+        self.total = 0
+        self.current = 0
+        self.last = None
+        self.scale = None
+
+    def add(self, word):
+        """Extend the group by word; returns False if it cannot."""
+        last = self.last
+        if word in _SMALL:
+            value = _SMALL[word]
+            joins = (last in ('hundred', 'scale') or
+                     (last == 'tens' and value < 10 and value))
+            kind = 'small'
+        elif word in _TENS:
+            value = _TENS[word]
+            joins = last in ('hundred', 'scale')
+            kind = 'tens'
+        elif word == 'hundred':
+            if last in ('small', 'tens') and self.current < 100:
+                self.current *= 100
+            elif last is None:
+                self.current = 100
+            else:
+                return False
+            self.last = 'hundred'
+            return True
+        elif word in SCALES:
+            scale = SCALES[word]
+            # Scales come largest first: "two million three thousand".
+            if last == 'scale' or self.scale is not None and \
+                    scale >= self.scale:
+                return False
+            if last is None:
+                self.current = 1
+            self.total += self.current * scale
+            self.current = 0
+            self.last = 'scale'
+            self.scale = scale
+            return True
+        else:
+            return False
+        if last is not None and not joins:
+            return False
+        self.current += value
+        self.last = kind
+        return True
+
+    def __str__(self):
+        return str(self.total + self.current)
+
+
+def _digits(words, strict=False):
+    """The digits of words; with strict, None if they are not a
+    well-formed number."""
+    out = []
+    group = None
+    # A filler word was skipped, so the next word must extend the group.
+    filler = False
+    for (index, word) in enumerate(words):
+        word = word.lower()
+        if word in NEGATIVE_WORDS and index == 0:
+            out.append('-')
+            continue
+        if word in FILLER_WORDS and group is not None:
+            if strict and (filler or group.last not in ('hundred', 'scale')):
+                return None
+            filler = True
+            continue
+        if group is not None and group.add(word):
+            filler = False
+            continue
+        if strict and filler:
+            return None
+        if group is not None:
+            out.append(str(group))
+            group = None
+        if word in POINT_WORDS:
+            if strict and '.' in out:
+                return None
+            out.append('.')
+            continue
+        if word.isdigit():
+            out.append(word)
+            continue
+        if strict and word in LEADING_WORDS and ''.join(out).strip('-'):
+            return None
+        group = _Group()
+        if not group.add(word):
+            if strict:
+                return None
+            out.append('?')
+            group = None
+    if strict and filler:
+        return None
+    if group is not None:
+        out.append(str(group))
+    elif strict and (not out or out[-1] in ('-', '.')):
+        return None
+    return ''.join(out)
+
+
+def digits(words):
+    """
+    Digits for a spoken number.
+
+    Parameters
+    ----------
+    words: sequence of str
+        spoken words, e.g. ['twenty', 'five']
+
+    Returns
+    -------
+    str
+        e.g. '25'; '?' stands for each word that is not part of a number
+    """
+    key = tuple(words)
+    try:
+        return _memo[key]
+    except KeyError:
+        pass
+    if len(_memo) >= MAX_MEMO:
+        _memo.clear()
+    result = _memo[key] = _digits(key)
+    return result
+
+
+def parse(words):
+    """
+    Digits for a spoken number, if words are one.
+
+    Parameters
+    ----------
+    words: sequence of str
+        spoken words, e.g. ['twenty', 'five']
+
+    Returns
+    -------
+    str or None
+        e.g. '25'; None if words are not a well-formed number
+    """
+    key = tuple(words)
+    try:
+        return _strict_memo[key]
+    except KeyError:
+        pass
+    if len(_strict_memo) >= MAX_MEMO:
+        _strict_memo.clear()
+    result = _strict_memo[key] = _digits(key, strict=True)
+    return result
+
+
+def value(words):
+    """The number spoken as an int or float; ValueError if words are not
+    a single number."""
+    text = digits(words)
+    if '.' in text:
+        return float(text)
+    return int(text)
@@ -0,0 +1,238 @@
+"""Where the time goes between Dragon firing a recognition and the keys
+reaching the server.
+
+Code under study is wrapped in spans:
+
+    with tracing.span('execute_batch', actions=12):
+        ...
+
+    @tracing.traced('Command.value')
+    def value(self, node):
+        ...
+
+and tracing.attach(grammar) adds spans for process_begin (context
+evaluation) and _process_recognition. Each finished span is kept in a
+bounded buffer that write_chrome_trace() saves in the Chrome trace event
+format (load it in chrome://tracing or ui.perfetto.dev), and its duration
+goes into a rolling histogram per span name. The "latency report" voice
+command in _latency.py prints the histograms and writes the trace.
+
+Set ENABLED to False to make spans free.
+"""
+import collections
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+
+ENABLED = True
+
+# Finished spans kept for the Chrome trace; older ones are dropped.
+MAX_EVENTS = 100000
+# Durations kept per span name for the histograms.
+HISTOGRAM_WINDOW = 1000
+
+TRACE_PATH = os.path.join(tempfile.gettempdir(), 'aenea_grammar_trace.json')
+
+
+class RollingHistogram(object):
+
+    """Durations of the last `window` spans of one name."""
+
+    def __init__(self, window=HISTOGRAM_WINDOW):
+        self.samples = collections.deque(maxlen=window)
+        self.count = 0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def copy(self):
+        histogram = RollingHistogram(self.samples.maxlen)
+        histogram.samples.extend(self.samples)
+        histogram.count = self.count
+        return histogram
+
+    def percentile(self, fraction):
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self):
+        if not self.samples:
+            return 'no samples'
+        return 'n=%d p50 %.2fms p95 %.2fms p99 %.2fms max %.2fms' % (
+            self.count,
+            1e3 * self.percentile(0.50),
+            1e3 * self.percentile(0.95),
+            1e3 * self.percentile(0.99),
+            1e3 * max(self.samples))
+
+
+class _Span(object):
+
+    __slots__ = ('tracer', 'name', 'args', 'start')
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = self.tracer.clock()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.record(self.name, self.start, self.tracer.clock(),
+                           self.args)
+
+
+class _NullSpan(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer(object):
+
+    """
+    Collects finished spans. Spans are recorded from any thread (the
+    dispatch worker records 'proxy send'), so reports work on copies
+    taken under a lock.
+
+    Parameters
+    ----------
+    max_events: int
+        spans kept for the Chrome trace
+    window: int
+        durations kept per span name for the histograms
+    clock: callable
+        time source, in seconds
+    """
+
+    def __init__(self, max_events=MAX_EVENTS, window=HISTOGRAM_WINDOW,
+                 clock=time.time):
+        self.clock = clock
+        self.window = window
+        self.events = collections.deque(maxlen=max_events)
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def span(self, name, **args):
+        return _Span(self, name, args)
+
+    def record(self, name, start, end, args=None):
+        thread = threading.current_thread().ident
+        with self._lock:
+            self.events.append((name, start, end, thread, args))
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = RollingHistogram(
+                    self.window)
+            histogram.add(end - start)
+
+    def reset(self):
+        with self._lock:
+            self.events.clear()
+            self.histograms = {}
+
+    def report(self):
+        """One line per span name, slowest p95 first."""
+        with self._lock:
+            histograms = [(name, histogram.copy()) for (name, histogram)
+                          in self.histograms.iteritems()]
+        histograms.sort(key=lambda item: -item[1].percentile(0.95))
+        return ['%-32s %s' % (name, histogram.summary())
+                for (name, histogram) in histograms]
+
+    def chrome_trace(self):
+        """The recorded spans as a Chrome trace event dict."""
+        pid = os.getpid()
+        events = []
+        with self._lock:
+            spans = list(self.events)
+        for (name, start, end, thread, args) in spans:
+            event = {'name': name, 'ph': 'X', 'pid': pid, 'tid': thread,
+                     'ts': 1e6 * start, 'dur': 1e6 * (end - start)}
+            if args:
+                event['args'] = args
+            events.append(event)
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, path):
+        with open(path, 'wb') as trace:
+            json.dump(self.chrome_trace(), trace)
+        return path
+
+tracer = Tracer()
+
+
+def span(name, **args):
+    """Context manager timing its block as a span called name."""
+    if not ENABLED:
+        return _NULL_SPAN
+    return tracer.span(name, **args)
+
+
+def traced(name):
+    """Decorator timing every call of a function as a span called name."""
+    def decorate(function):
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return function(*args, **kwargs)
+            start = tracer.clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                tracer.record(name, start, tracer.clock())
+        wrapper.__name__ = function.__name__
+        wrapper.__doc__ = function.__doc__
+        return wrapper
+    return decorate
+
+
+def attach(grammar):
+    """Trace grammar's process_begin and its exported rules'
+    _process_recognition. Callables already traced, such as those of rules
+    reused by a rebuilt grammar, are left as they are."""
+    process_begin = grammar.process_begin
+    if not getattr(process_begin, 'traced', False):
+        @functools.wraps(process_begin)
+        def traced_begin(executable, title, handle):
+            with span('process_begin', grammar=grammar.name):
+                return process_begin(executable, title, handle)
+        traced_begin.traced = True
+        grammar.process_begin = traced_begin
+
+    for rule in grammar.rules:
+        if rule.exported and hasattr(rule, '_process_recognition') and \
+                not getattr(rule._process_recognition, 'traced', False):
+            rule._process_recognition = _traced_recognition(rule)
+
+
+def _traced_recognition(rule):
+    process_recognition = rule._process_recognition
+
+    # wraps() also carries over the marks of other wrappers, such as
+    # recorder's, so neither wraps the other again.
+    @functools.wraps(process_recognition)
+    def traced_recognition(node, extras):
+        with span('_process_recognition', rule=rule.name):
+            return process_recognition(node, extras)
+    traced_recognition.traced = True
+    return traced_recognition
+
+
+def dump(path=None):
+    """Print the histograms and write the Chrome trace; returns its path."""
+    for line in tracer.report():
+        print line
+    path = tracer.write_chrome_trace(path or TRACE_PATH)
+    print 'trace of %d spans written to %s' % (len(tracer.events), path)
+    return path
@@ -0,0 +1,1031 @@
+# Dragonfly module for controlling vim on Linux modelessly. All verbal commands
+# start and end in command mode, making it effective to combine voice and
+# keyboard.
+#
+# This is the rule graph shared by _vim.py, _rstudio.py, catchall.py and
+# vim2.py. Each of those is an overlay: a VimOverlay naming its context and
+# the mappings it changes, passed to register(). Every registered overlay
+# becomes one exported VimCommand rule, with the overlay's context, in a
+# single 'vim' grammar. Rules whose mappings are the same for several
+# overlays are built once and referenced from each of their VimCommands, so
+# Dragon compiles and holds one rule set instead of one per application.
+# The grammar is built at the start of the first utterance after the
+# overlays change, once for all the modules Natlink loaded meanwhile.
+
+LEADER = 'comma'
+
+import sys
+
+import aenea.config
+import aenea.misc
+import aenea.vocabulary
+
+from aenea import (
+    Key,
+    NoAction,
+    Text
+    )
+
+import action_compiler
+import batching
+import dispatch
+import formatting
+import grammar_cache
+import lazy_grammar
+import recorder
+import spoken_numbers
+import tracing
+
+from dragonfly import (
+    Alternative,
+    Choice,
+    CompoundRule,
+    Dictation,
+    DictListRef,
+    Grammar,
+    Impossible,
+    IntegerRef,
+    MappingRule,
+    Repetition,
+    Rule,
+    RuleRef
+    )
+
+VIM_TAGS = ['vim.insertions.code', 'vim.insertions']
+
+# Build an overlay's ExMode grammar as soon as its context is focused
+# rather than when "execute" is first said.
+EX_MODE_PRELOAD = False
+
+# Build the shared grammar at the start of the next utterance rather than
+# at every register(), so the overlays registered while Natlink imports the
+# grammar modules are compiled and loaded once.
+DEFER_LOAD = True
+
+grammar_cache.install()
+
+
+# ****************************************************************************
+# DEFAULT MAPPINGS
+# ****************************************************************************
+# What an overlay gets unless it passes its own.
+
+INSERT_MODE_ENTRIES = {
+    'inns': Key('i'),
+    'syn': Key('a'),
+    'phyllo': Key('o'),
+    'phylum': Key('O'),
+    }
+
+# Spoken formatter names IdentifierInsertion accepts, in spec order.
+FORMATTERS = [
+    'proper', 'camel', 'rel-path', 'abs-path', 'score', 'sentence',
+    'scope-resolve', 'jumble', 'dotword', 'dashword', 'natword', 'snakeword',
+    'brooding-narrative',
+    ]
+
+KEY_INSERTIONS = {
+    '<text>':               Text('%(text)s'), #catch-all for text
+    'ace [<count>]':        Key('space:%(count)d'),
+    'tab [<count>]':        Key('tab:%(count)d'),
+    'slap [<count>]':       Key('enter:%(count)d'),
+    'chuck [<count>]':      Key('del:%(count)d'),
+    'scratch [<count>]':    Key('backspace:%(count)d'),
+    'ack':                  Key('escape'),
+    }
+
+ARITHMETIC_INSERTIONS = {
+    'assign':           Text('= '),
+    'compare eek':      Text('== '),
+    'compare not eek':  Text('!= '),
+    'compare greater':  Text('> '),
+    'compare less':     Text('< '),
+    'compare geck':     Text('>= '),
+    'compare lack':     Text('<= '),
+    'bit ore':          Text('| '),
+    'bit and':          Text('& '),
+    'bit ex or':        Text('^ '),
+    'times':            Text('* '),
+    'divided':          Text('/ '),
+    'plus':             Text('+ '),
+    'minus':            Text('- '),
+    'plus equal':       Text('+= '),
+    'minus equal':      Text('-= '),
+    'times equal':      Text('*= '),
+    'divided equal':    Text('/= '),
+    'mod equal':        Text('%%= '),
+    }
+
+MOTIONS = {
+    'up': Text('k'),
+    'down': Text('j'),
+    'left': Text('h'),
+    'right': Text('l'),
+
+    'lope': Text('b'),
+    'yope': Text('w'),
+    'elope': Text('ge'),
+    'iyope': Text('e'),
+
+    'lopert': Text('B'),
+    'yopert': Text('W'),
+    'elopert': Text('gE'),
+    'eyopert': Text('E'),
+
+    'apla': Text('{'),
+    'anla': Text('}'),
+    'sapla': Text('('),
+    'sanla': Text(')'),
+
+    'care': Text('^'),
+    'hard care': Text('0'),
+    'doll': Text('$'),
+
+    'screecare': Text('g^'),
+    'screedoll': Text('g$'),
+
+    'scree up': Text('gk'),
+    'scree down': Text('gj'),
+
+    'go': Text('G'),
+
+    'page high': Text('H'),
+    'page low': Text('L'),
+
+    # CamelCaseMotion plugin
+    'calalope': Text(',b'),
+    'calayope': Text(',w'),
+    'end calayope': Text(',e'),
+    'inner calalope': Text('i,b'),
+    'inner calayope': Text('i,w'),
+    'inner end calayope': Text('i,e'),
+
+    # EasyMotion
+    'easy lope': Key('%s:2, b' % LEADER),
+    'easy yope': Key('%s:2, w' % LEADER),
+    'easy elope': Key('%s:2, g, e' % LEADER),
+    'easy iyope': Key('%s:2, e' % LEADER),
+
+    'easy lopert': Key('%s:2, B' % LEADER),
+    'easy yopert': Key('%s:2, W' % LEADER),
+    'easy elopert': Key('%s:2, g, E' % LEADER),
+    'easy eyopert': Key('%s:2, E' % LEADER),
+    }
+
+OPERATORS = {
+    'relo': '',
+    #'dell': 'd',
+    'chaos': 'c',
+    #'nab': 'y',
+    'swap case': 'g~',
+    'uppercase': 'gU',
+    'lowercase': 'gu',
+    'external filter': '!',
+    'external format': '=',
+    'format text': 'gq',
+    'rotate thirteen': 'g?',
+    #'indent left': '<',
+    #'indent right': '>',
+    'define fold': 'zf',
+    }
+
+COMMANDS = {
+    'flax': Key('X'),
+    'nix': Key('x'),
+    'undo': Key('u'),
+    'pesto': Key('P'),
+    'post': Key('p'),
+    'ditto': Text('.'),
+    'slasher': Text('/'),
+    'ripple': 'macro',
+    "visual": Key("v"),
+    "visual line": Key("s-v"),
+    "visual block": Key("c-v"),
+    'dell': Key('d'),
+    'yank': Key('y'),
+    "dello": Text("daw"),
+    "cello": Text("caw")
+    #"indent left": Key("<"),
+    #"indent right": Key(">")
+    }
+
+EX_COMMANDS = {
+    "read": Text("r "),
+    "(write|save) file": Text("w "),
+    "quit": Text("q "),
+    "turbo quit": Text("q! "),
+    "write and quit": Text("wq "),
+    "edit": Text("e "),
+    "tab edit": Text("tabe "),
+
+    "set number": Text("set number "),
+    "set relative number": Text("set relativenumber "),
+    "set ignore case": Text("set ignorecase "),
+    "set no ignore case": Text("set noignorecase "),
+    "set file format UNIX": Text("set fileformat=unix "),
+    "set file format DOS": Text("set fileformat=dos "),
+    "set file type Python": Text("set filetype=python"),
+    "set file type tex": Text("set filetype=tex"),
+
+    "P. W. D.": Text("pwd "),
+
+    "help": Text("help"),
+    "substitute": Text("s/"),
+    "up": Key("up"),
+    "down": Key("down"),
+    "[<n>] left": Key("left:%(n)d"),
+    "[<n>] right": Key("right:%(n)d"),
+    }
+
+
+class VimOverlay(object):
+
+    """
+    What one application changes about the shared vim grammar.
+
+    Every mapping defaults to the module-level one of the same name in
+    upper case; pass a dict to replace it.
+
+    Parameters
+    ----------
+    name: str
+        module the overlay is defined in; names its rules and recordings
+    context: dragonfly.Context
+        where the overlay's commands are active
+    insert_mode_entries, key_insertions, arithmetic_insertions, motions,
+    commands: dict
+        MappingRule mappings; motions gets the inner/outer word objects
+        added
+    operators: dict
+        spoken operator -> vim operator keys
+    formatters: list of str
+        spoken formatter names for literal identifiers, each registered in
+        formatting.FORMATTERS
+    ex_commands: dict or None
+        ExMode mapping; None leaves ExMode out
+    insert_default: action or None
+        run before insertions not led by an insert mode entry
+    insert_exit: action or None
+        run after each run of insertions
+    """
+
+    def __init__(self, name, context,
+                 insert_mode_entries=INSERT_MODE_ENTRIES,
+                 key_insertions=KEY_INSERTIONS,
+                 arithmetic_insertions=ARITHMETIC_INSERTIONS,
+                 motions=MOTIONS,
+                 operators=OPERATORS,
+                 commands=COMMANDS,
+                 formatters=FORMATTERS,
+                 ex_commands=EX_COMMANDS,
+                 insert_default=None,
+                 insert_exit=Key('escape:2')):
+        missing = formatting.unknown(formatters)
+        if missing:
+            raise ValueError('no formatter registered for %s' %
+                             ', '.join(missing))
+        self.name = name
+        self.context = context
+        self.insert_mode_entries = insert_mode_entries
+        self.key_insertions = key_insertions
+        self.arithmetic_insertions = arithmetic_insertions
+        self.motions = motions
+        self.operators = operators
+        self.commands = commands
+        self.formatters = formatters
+        self.ex_commands = ex_commands
+        self.insert_default = insert_default
+        self.insert_exit = insert_exit
+
+
+# TODO: this can NOT be the right way to do this...
+class NumericDelegateRule(CompoundRule):
+    @tracing.traced('NumericDelegateRule.value')
+    def value(self, node):
+        delegates = node.children[0].children[0].children
+        value = delegates[-1].value()
+        if delegates[0].value() is not None:
+            return Text('%s' % delegates[0].value()) + value
+        else:
+            return value
+
+
+class _DigitalIntegerFetcher(object):
+    def __init__(self):
+        self.cached = {}
+
+    def __getitem__(self, length):
+        if length not in self.cached:
+            self.cached[length] = aenea.misc.DigitalInteger('count', 1, length)
+        return self.cached[length]
+ruleDigitalInteger = _DigitalIntegerFetcher()
+
+
+class SpokenNumber(Repetition):
+    '''A number said as it is read ("twenty five", "four two", "minus
+       three point one four"), valued as its digits by spoken_numbers, so
+       mappings need one entry for all numbers rather than one per number.
+       Word sequences spoken_numbers.parse rejects ("and", "one million
+       thousand") do not decode, so the rule does not match them.'''
+    child = Choice('word', dict((word, word) for word in spoken_numbers.WORDS))
+
+    def __init__(self, name, max=8, *args, **kw):
+        Repetition.__init__(self, self.child, 1, max, name=name, *args, **kw)
+
+    def decode(self, state):
+        begin = state._index
+        for result in Repetition.decode(self, state):
+            if spoken_numbers.parse(state.words(begin, state._index)):
+                yield result
+
+    def value(self, node):
+        return spoken_numbers.parse(Repetition.value(self, node))
+
+spokenNumber = SpokenNumber('number')
+
+
+def execute_insertion_buffer(insertion_buffer, overlay):
+    if not insertion_buffer:
+        return
+
+    if insertion_buffer[0][0] is not None:
+        insertion_buffer[0][0].execute()
+    elif overlay.insert_default is not None:
+        overlay.insert_default.execute()
+
+    for insertion in insertion_buffer:
+        insertion[1].execute()
+
+    if overlay.insert_exit is not None:
+        overlay.insert_exit.execute()
+
+# ****************************************************************************
+# IDENTIFIERS
+# ****************************************************************************
+
+
+class IdentifierInsertion(CompoundRule):
+    spec = '[upper | natural] ( %s ) [<dictation>]'
+    extras = [Dictation(name='dictation')]
+
+    @tracing.traced('IdentifierInsertion.value')
+    def value(self, node):
+        return Text(formatting.format_words(node.words()))
+
+
+class LiteralIdentifierInsertion(CompoundRule):
+    spec = '[<InsertModeEntry>] literal <IdentifierInsertion>'
+
+    def value(self, node):
+        children = node.children[0].children[0].children
+        return [('i', (children[0].value(), children[2].value()))]
+
+
+# ****************************************************************************
+# INSERTIONS
+# ****************************************************************************
+
+class SpellingInsertion(MappingRule):
+    mapping = dict(('dig ' + key, val) for (key, val) in aenea.misc.DIGITS.iteritems())
+    mapping.update(aenea.misc.LETTERS)
+
+    def value(self, node):
+        return Text(MappingRule.value(self, node))
+
+
+class PrimitiveInsertion(CompoundRule):
+    spec = '<insertion>'
+
+    def value(self, node):
+        children = node.children[0].children[0].children
+        return children[0].value()
+
+
+class PrimitiveInsertionRepetition(CompoundRule):
+    spec = '<PrimitiveInsertion> [ parrot <count> ]'
+
+    def value(self, node):
+        children = node.children[0].children[0].children
+        holder = children[1].value()[1] if children[1].value() else 1
+        value = children[0].value() * holder
+        return value
+
+
+class Insertion(CompoundRule):
+    spec = '[<InsertModeEntry>] <PrimitiveInsertionRepetition>'
+
+    def value(self, node):
+        children = node.children[0].children[0].children
+        return [('i', (children[0].value(), children[1].value()))]
+
+
+# ****************************************************************************
+# MOTIONS
+# ****************************************************************************
+
+
+def motion_mapping(motions):
+    """motions plus the inner/outer word text objects."""
+    mapping = dict(motions)
+    for (spoken_object, command_object) in (('(lope | yope)', 'w'),
+                                            ('(lopert | yopert)', 'W')):
+        for (spoken_modifier, command_modifier) in (('inner', 'i'),
+                                                    ('outer', 'a')):
+            map_action = Text(command_modifier + command_object)
+            mapping['%s %s' % (spoken_modifier, spoken_object)] = map_action
+    return mapping
+
+
+UNCOUNTED_MOTIONS = {
+    'tect': Text('%%'),
+    'matu': Text('M'),
+    }
+
+MOTION_PARAMETER_MOTIONS = {
+    'phytic': 'f',
+    'fitton': 'F',
+    'pre phytic': 't',
+    'pre fitton': 'T',
+    }
+
+
+class ParameterizedMotion(CompoundRule):
+    spec = '<MotionParameterMotion> <LetterMapping>'
+
+    def value(self, node):
+        children = node.children[0].children[0].children
+        return Text(children[0].value() + children[1].value())
+
+
+class Motion(CompoundRule):
+    spec = '<motion>'
+
+    def value(self, node):
+        return node.children[0].children[0].children[0].value()
+
+
+# ****************************************************************************
+# OPERATORS
+# ****************************************************************************
+
+
+class OperatorApplicationMotion(CompoundRule):
+    spec = '[<Operator>] <Motion>'
+
+    def value(self, node):
+        children = node.children[0].children[0].children
+        return_value = children[1].value()
+        if children[0].value() is not None:
+            return_value = children[0].value() + return_value
+        return return_value
+
+
+class OperatorSelfApplication(MappingRule):
+    extras = [ruleDigitalInteger[3]]
+    defaults = {'count': 1}
+
+    def value(self, node):
+        value = MappingRule.value(self, node)
+        if value == 'tcomment':
+            # ugly hack to get around tComment's not allowing ranges with gcc.
+            value = node.children[0].children[0].children[0].children[1].value()
+            if value in (1, '1', None):
+                return Text('gcc')
+            else:
+                return Text('gc%dj' % (int(value) - 1))
+        else:
+            return value
+
+
+# ****************************************************************************
+# COMMANDS
+# ****************************************************************************
+
+
+class Command(CompoundRule):
+    spec = '[<count>] [reg <LetterMapping>] <command>'
+
+    @tracing.traced('Command.value')
+    def value(self, node):
+        delegates = node.children[0].children[0].children
+        value = delegates[-1].value()
+        prefix = ''
+        if delegates[0].value() is not None:
+            prefix += str(delegates[0].value())
+        if delegates[1].value() is not None:
+            # Hack for macros
+            reg = delegates[1].value()[1]
+            if value == 'macro':
+                prefix += '@' + reg
+                value = None
+            else:
+                prefix += "'" + reg
+        if prefix:
+            if value is not None:
+                value = Text(prefix) + value
+            else:
+                value = Text(prefix)
+        # TODO: ugly hack; should fix the grammar or generalize.
+        if 'chaos' in zip(*node.results)[0]:
+            return [('c', value), ('i', (NoAction(),) * 2)]
+        else:
+            return [('c', value)]
+
+
+# ****************************************************************************
+
+
+class VimCommand(CompoundRule):
+    # A bare insert mode entry only enters insert mode, and a bare operator
+    # does nothing, rather than either being typed as an insertion.
+    spec = ('[<app>] [<literal>] | <InsertModeEntry> | <Operator>')
+
+    def __init__(self, overlay, *args, **kwargs):
+        self.overlay = overlay
+        self.module = overlay.name
+        CompoundRule.__init__(self, *args, **kwargs)
+
+    def _process_recognition(self, node, extras):
+        if 'InsertModeEntry' in extras:
+            extras['InsertModeEntry'].execute(extras)
+            return
+        insertion_buffer = []
+        commands = []
+        if 'app' in extras:
+            for chunk in extras['app']:
+                commands.extend(chunk)
+        if 'literal' in extras:
+            commands.extend(extras['literal'])
+        with batching.batched():
+            for command in commands:
+                mode, command = command
+                if mode == 'i':
+                    insertion_buffer.append(command)
+                else:
+                    execute_insertion_buffer(insertion_buffer, self.overlay)
+                    insertion_buffer = []
+                    command.execute(extras)
+            execute_insertion_buffer(insertion_buffer, self.overlay)
+
+
+# ****************************************************************************
+# RULE SET
+# ****************************************************************************
+
+
+def _signature(mapping):
+    """Identifies a mapping by its specs and actions, so overlays with the
+    same mapping share one rule."""
+    return tuple(sorted((spec, repr(value) if isinstance(value, basestring)
+                         else str(value))
+                        for (spec, value) in mapping.iteritems()))
+
+
+class _RuleSet(object):
+
+    """Builds the rules of one 'vim' grammar, sharing every rule whose
+    contents are the same between overlays, and taking over from the
+    previous build every rule whose contents have not changed."""
+
+    def __init__(self, vocabulary, previous=None):
+        self.vocabulary = vocabulary
+        self.previous = previous or {}
+        self._refs = {}
+        self._names = set()
+        self.built = 0
+        self.reused = 0
+
+    def ref(self, key, spec_name, build, overlay):
+        """RuleRef called spec_name to the rule identified by key, taken
+        from the previous build if it had one, else built with
+        build(rule_name) the first time it is asked for."""
+        if key in self._refs:
+            return self._refs[key]
+        rule = self.previous.get(key)
+        if rule is not None and rule.name not in self._names:
+            self.reused += 1
+        else:
+            name = key[0]
+            if name in self._names:
+                name = '%s.%s' % (name, overlay.name)
+            suffix = 1
+            while name in self._names:
+                suffix += 1
+                name = '%s.%s.%d' % (key[0], overlay.name, suffix)
+            rule = build(name)
+            self.built += 1
+        self._names.add(rule.name)
+        self._refs[key] = RuleRef(rule, name=spec_name)
+        return self._refs[key]
+
+    @property
+    def rules(self):
+        """{key: rule} of this build, for the next one to take over."""
+        return dict((key, ref.rule) for (key, ref) in self._refs.iteritems())
+
+    def mapping(self, kind, mapping, overlay, rule_class=MappingRule,
+                spec_name=None, **kwargs):
+        return self.ref(
+            (kind, _signature(mapping)), spec_name or kind,
+            lambda name: rule_class(name=name, mapping=mapping,
+                                    exported=False, **kwargs),
+            overlay)
+
+    def compound(self, kind, rule_class, extras, overlay, spec=None,
+                 spec_name=None):
+        """A CompoundRule of rule_class over extras; shared between
+        overlays whose extras refer to the same rules."""
+        key = (kind, spec) + tuple(_element_key(extra) for extra in extras)
+        return self.ref(
+            key, spec_name or kind,
+            lambda name: rule_class(name=name, spec=spec, extras=extras,
+                                    exported=False),
+            overlay)
+
+    def vim_command(self, overlay):
+        letters = self.mapping('LetterMapping', aenea.misc.LETTERS, overlay)
+        insert_mode_entry = self.mapping(
+            'InsertModeEntry', overlay.insert_mode_entries, overlay)
+
+        identifier = self.compound(
+            'IdentifierInsertion', IdentifierInsertion,
+            IdentifierInsertion.extras, overlay,
+            spec=IdentifierInsertion.spec % ' | '.join(overlay.formatters))
+        literal = self.compound(
+            'LiteralIdentifierInsertion', LiteralIdentifierInsertion,
+            [identifier, insert_mode_entry], overlay, spec_name='literal')
+
+        primitive_insertions = [
+            self.mapping(
+                'KeyInsertion',
+                action_compiler.compile_mapping(overlay.key_insertions),
+                overlay, extras=[Dictation("text"), ruleDigitalInteger[3]],
+                defaults={'count': 1}),
+            identifier,
+            ] + self.vocabulary + [
+            self.mapping(
+                'ArithmeticInsertion',
+                action_compiler.compile_mapping(
+                    overlay.arithmetic_insertions),
+                overlay, extras=[spokenNumber]),
+            self.mapping('SpellingInsertion', SpellingInsertion.mapping,
+                         overlay, rule_class=SpellingInsertion),
+            ] + self.static_vocabulary(overlay)
+        primitive_insertion = self.compound(
+            'PrimitiveInsertion', PrimitiveInsertion,
+            [Alternative(primitive_insertions, name='insertion')], overlay)
+        repetition = self.compound(
+            'PrimitiveInsertionRepetition', PrimitiveInsertionRepetition,
+            [primitive_insertion, ruleDigitalInteger[3]], overlay)
+        insertion = self.compound(
+            'Insertion', Insertion, [repetition, insert_mode_entry], overlay)
+
+        parameterized = self.compound(
+            'ParameterizedMotion', ParameterizedMotion,
+            [letters, self.mapping('MotionParameterMotion',
+                                   MOTION_PARAMETER_MOTIONS, overlay)],
+            overlay)
+        counted = self.compound(
+            'CountedMotion', NumericDelegateRule,
+            [ruleDigitalInteger[3],
+             Alternative([
+                 self.mapping(
+                     'PrimitiveMotion',
+                     action_compiler.compile_mapping(
+                         motion_mapping(overlay.motions)),
+                     overlay),
+                 parameterized], name='motion')],
+            overlay, spec='[<count>] <motion>')
+        motion = self.compound(
+            'Motion', Motion,
+            [Alternative([counted, self.mapping(
+                'UncountedMotion', UNCOUNTED_MOTIONS, overlay)],
+                name='motion')],
+            overlay)
+
+        primitive_operators = dict(
+            (key, Text(val)) for (key, val) in overlay.operators.iteritems())
+        # tComment
+        primitive_operators['comm nop'] = Text('gc')
+        operator = self.compound(
+            'Operator', NumericDelegateRule,
+            [ruleDigitalInteger[3],
+             self.mapping('PrimitiveOperator', primitive_operators, overlay)],
+            overlay, spec='[<count>] <PrimitiveOperator>')
+        self_applications = dict(
+            ('%s [<count>] %s' % (key, key),
+             Text('%s%%(count)d%s' % (value, value)))
+            for (key, value) in overlay.operators.iteritems())
+        # tComment
+        # string not action intentional dirty hack.
+        self_applications['comm nop [<count>] comm nop'] = 'tcomment'
+        operator_application = Alternative([
+            self.compound('OperatorApplicationMotion',
+                          OperatorApplicationMotion, [operator, motion],
+                          overlay),
+            self.mapping('OperatorSelfApplication', self_applications,
+                         overlay, rule_class=OperatorSelfApplication),
+            ], name='OperatorApplication')
+
+        command = self.compound(
+            'Command', Command,
+            [Alternative([
+                operator_application,
+                self.mapping(
+                    'PrimitiveCommand',
+                    action_compiler.compile_mapping(overlay.commands),
+                    overlay),
+                ], name='command'),
+             ruleDigitalInteger[3],
+             letters],
+            overlay)
+
+        return VimCommand(
+            overlay, name='VimCommand.%s' % overlay.name,
+            extras=[Repetition(Alternative([command, insertion]), max=10,
+                               name='app'),
+                    literal, insert_mode_entry, operator],
+            context=overlay.context)
+
+    def static_vocabulary(self, overlay):
+        refs = []
+        for tag in VIM_TAGS:
+            mapping = aenea.vocabulary.get_static_vocabulary(tag)
+            if mapping:
+                refs.append(self.mapping(
+                    'static %s mapping' % tag, mapping, overlay,
+                    spec_name='static %s' % tag))
+        return refs
+
+
+def _element_key(element):
+    """What makes an extra the same for two overlays or two builds: the
+    rule a RuleRef points at, the keys of an Alternative's children, else
+    the element itself. Rules are only reused while unchanged, so a rule's
+    identity stands for its contents."""
+    if isinstance(element, RuleRef):
+        return ('rule', id(element.rule))
+    if isinstance(element, Alternative):
+        return ('alternative', element.name) + tuple(
+            _element_key(child) for child in element.children)
+    return id(element)
+
+
+# ****************************************************************************
+# EX MODE
+# ****************************************************************************
+###borrowed from https://github.com/davitenio/dragonfly-macros/blob/master/gvim.py
+
+
+class ExMode(object):
+
+    """The ExMode grammars of one overlay: the bootstrap listens for
+    "execute", after which only the ExMode commands are active until "kay"
+    or "cancel".
+
+    Only the bootstrap is loaded up front. The ExMode grammar is built
+    and loaded when "execute" is first said (or, with EX_MODE_PRELOAD,
+    when the overlay's context is first focused) and unloaded again after
+    lazy_grammar.IDLE_TIMEOUT seconds out of ExMode."""
+
+    def __init__(self, overlay):
+        self.overlay = overlay
+        self.bootstrap = Grammar("ExMode bootstrap", context=overlay.context)
+        self.bootstrap.add_rule(ExModeEnabler(self))
+        for rule in self.bootstrap.rules:
+            rule.module = overlay.name
+        self.lazy = lazy_grammar.LazyGrammar(
+            'ExMode grammar %s' % overlay.name, self._build)
+
+    def _build(self):
+        grammar = Grammar("ExMode grammar", context=self.overlay.context)
+        grammar.add_rule(ExModeCommands(mapping=self.overlay.ex_commands))
+        grammar.add_rule(ExModeDisabler(self))
+        for rule in grammar.rules:
+            rule.module = self.overlay.name
+        grammar_cache.track(grammar, _sources(self.overlay))
+        grammar.load()
+        recorder.attach(grammar)
+        tracing.attach(grammar)
+        grammar.disable()
+        return grammar
+
+    def _preload(self, executable, title, handle):
+        if EX_MODE_PRELOAD and not self.lazy.loaded and \
+                self.overlay.context.matches(executable, title, handle):
+            self.lazy.get()
+
+    def load(self):
+        grammar_cache.track(self.bootstrap, _sources(self.overlay))
+        self.bootstrap.load()
+        recorder.attach(self.bootstrap)
+        tracing.attach(self.bootstrap)
+        lazy_grammar.watch(self.bootstrap, [self.lazy], self._preload)
+
+    def enable(self):
+        self.bootstrap.disable()
+        self.lazy.get().enable()
+
+    def disable(self):
+        self.lazy.get().disable()
+        self.bootstrap.enable()
+
+    def unload(self):
+        self.bootstrap.unload()
+        self.lazy.unload()
+
+
+class ExModeEnabler(CompoundRule):
+    # Spoken command to enable the ExMode grammar.
+    spec = "execute"
+
+    def __init__(self, ex_mode):
+        self.ex_mode = ex_mode
+        CompoundRule.__init__(self)
+
+    # Callback when command is spoken.
+    def _process_recognition(self, node, extras):
+        #normalModeGrammar.disable()
+        self.ex_mode.enable()
+        Key("colon").execute()
+        #print "ExMode grammar enabled"
+        #print "Available commands:"
+        #print '  \n'.join(ExModeCommands.mapping.keys())
+        #print "\n(EX MODE)"
+
+
+class ExModeDisabler(CompoundRule):
+    # spoken command to exit ex mode
+    spec = "<command>"
+    extras = [Choice("command", {
+        "kay": "okay",
+        "cancel": "cancel",
+    })]
+
+    def __init__(self, ex_mode):
+        self.ex_mode = ex_mode
+        CompoundRule.__init__(self)
+
+    def _process_recognition(self, node, extras):
+        self.ex_mode.disable()
+        #normalModeGrammar.enable()
+        if extras["command"] == "cancel":
+            #print "ex mode command canceled"
+            Key("escape").execute()
+        else:
+            #print "ex mode command accepted"
+            Key("enter").execute()
+        #print "\n(NORMAL)"
+
+
+# handles ExMode control structures
+class ExModeCommands(MappingRule):
+    extras = [
+        Dictation("text"),
+        IntegerRef("n", 1, 50),
+    ]
+    defaults = {
+        "n": 1,
+}
+
+
+# ****************************************************************************
+# REGISTRATION
+# ****************************************************************************
+
+_overlays = []
+_ex_modes = {}
+grammar = None
+# DictListRefs to the dynamic vocabulary, kept while any overlay is
+# registered.
+_vocabulary = None
+# Rules of the last build by _RuleSet key, for the next build to reuse.
+_rules = {}
+# The _RuleSet of the last build, for its built/reused counts.
+last_build = None
+# Whether the overlays changed since the shared grammar was built.
+_pending = False
+# Resident grammar whose process_begin builds the shared one when pending.
+_loader = None
+
+
+def _sources(*overlays):
+    """Modules the grammars of overlays are compiled from."""
+    return [sys.modules[__name__], action_compiler, spoken_numbers,
+            aenea.misc] + [
+        sys.modules[overlay.name] for overlay in overlays
+        if overlay.name in sys.modules]
+
+
+def register(overlay):
+    """Add overlay's VimCommand (and ExMode grammars) to the shared grammar,
+    which is rebuilt at the start of the next utterance or by
+    load_pending(). An overlay from the module of one already registered
+    replaces it, which is how a reloaded module takes effect."""
+    names = [registered.name for registered in _overlays]
+    if overlay.name in names:
+        _overlays[names.index(overlay.name)] = overlay
+    else:
+        _overlays.append(overlay)
+    ex_mode = _ex_modes.pop(overlay.name, None)
+    if ex_mode is not None:
+        ex_mode.unload()
+    if overlay.ex_commands is not None:
+        _ex_modes[overlay.name] = ExMode(overlay)
+        _ex_modes[overlay.name].load()
+    _changed()
+
+
+def unregister(overlay):
+    """Remove overlay; the shared grammar is unloaded with the last one."""
+    dispatch.flush()
+    if overlay in _overlays:
+        _overlays.remove(overlay)
+    ex_mode = _ex_modes.pop(overlay.name, None)
+    if ex_mode is not None:
+        ex_mode.unload()
+    _changed()
+
+
+def load_pending(window=None):
+    """Build and load the shared grammar now if the overlays changed since
+    it was built. Returns whether it was.
+
+    window is the (executable, title, handle) of the utterance under way,
+    if any: a grammar loaded during one missed its own process_begin, so
+    its context is evaluated with these."""
+    global _pending
+    if not _pending:
+        return False
+    _pending = False
+    _rebuild()
+    if window is not None and grammar is not None:
+        grammar.process_begin(*window)
+    return True
+
+
+def _changed():
+    # With overlays left and DEFER_LOAD, the build waits for the next
+    # utterance; meanwhile the old grammar, if any, stays loaded.
+    global _pending, _loader
+    if not _overlays or not DEFER_LOAD:
+        _pending = False
+        if _loader is not None and not _overlays:
+            _loader.unload()
+            _loader = None
+        _rebuild()
+        return
+    _pending = True
+    if _loader is None:
+        _loader = Grammar('vim loader')
+        _loader.add_rule(Rule('vim loader', Impossible(), exported=True))
+        _loader.load()
+        lazy_grammar.watch(_loader, [], _load_at_begin)
+
+
+def _load_at_begin(executable, title, handle):
+    load_pending((executable, title, handle))
+
+
+def _rebuild():
+    # Dragonfly cannot add rules to a loaded grammar, so the grammar is
+    # built afresh from all overlays whenever one comes, goes or is
+    # replaced. Rules whose contents are unchanged and the dynamic
+    # vocabulary lists are carried over rather than built again.
+    global grammar, _vocabulary, _rules, last_build
+    if grammar is not None:
+        aenea.vocabulary.uninhibit_global_dynamic_vocabulary('vim', VIM_TAGS)
+        grammar.unload()
+        grammar = None
+    if not _overlays:
+        if _vocabulary is not None:
+            for tag in VIM_TAGS:
+                aenea.vocabulary.unregister_dynamic_vocabulary(tag)
+        _vocabulary = None
+        _rules = {}
+        return
+
+    context = _overlays[0].context
+    for overlay in _overlays[1:]:
+        context = context | overlay.context
+    grammar = Grammar('vim', context=context)
+    aenea.vocabulary.inhibit_global_dynamic_vocabulary('vim', VIM_TAGS, context)
+
+    if _vocabulary is None:
+        _vocabulary = [
+            DictListRef(
+                'dynamic %s' % tag,
+                aenea.vocabulary.register_dynamic_vocabulary(tag)
+                )
+            for tag in VIM_TAGS]
+    rules = _RuleSet(_vocabulary, _rules)
+    with tracing.span('vim_core.build', overlays=len(_overlays)):
+        for overlay in _overlays:
+            grammar.add_rule(rules.vim_command(overlay))
+    _rules = rules.rules
+    last_build = rules
+    grammar_cache.track(grammar, _sources(*_overlays))
+    grammar.load()
+    recorder.attach(grammar)
+    tracing.attach(grammar)
+    grammar_cache.flush()
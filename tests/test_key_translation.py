@@ -0,0 +1,111 @@
+"""aenea_client.KeyTranslator must translate exactly as AeneaClient.send_key
+did before translation was precompiled.
+
+ReferenceTranslator is that original state machine. Random event streams,
+heavy on Alt_L / 0 / ?? so every alt-sequence path is hit, are fed to both
+with fixed seeds, and every (display, send) result must match.
+"""
+import os
+import StringIO
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'grammars'))
+
+import aenea_client
+from aenea_client import (
+    ALT_KEY_SEQUENCE_MAP,
+    IGNORED_KEYS,
+    TRANSLATE_KEYS,
+    AltKeySequenceState,
+    )
+
+SEEDS = range(10)
+STREAMS = 200
+STREAM_LENGTH = 50
+
+
+class ReferenceTranslator(object):
+
+    def __init__(self):
+        self.alt_key_sequence = AltKeySequenceState.NO_SEQUENCE
+
+    def translate(self, char, key):
+        if key == 'Alt_L':
+            self.alt_key_sequence = AltKeySequenceState.STARTING_ALT_SEQUENCE
+            return None, None
+
+        if self.alt_key_sequence == AltKeySequenceState.STARTING_ALT_SEQUENCE:
+            if key == '0':
+                self.alt_key_sequence = AltKeySequenceState.IN_ALT_SEQUENCE
+                return None, None
+            else:
+                self.alt_key_sequence = AltKeySequenceState.NO_SEQUENCE
+
+        if self.alt_key_sequence == AltKeySequenceState.IN_ALT_SEQUENCE:
+            if key == '??':
+                self.alt_key_sequence = AltKeySequenceState.ENDING_ALT_SEQUENCE
+            else:
+                return None, None
+
+        display = key if key != 'space' else ' '
+        if key in IGNORED_KEYS:
+            return display, None
+
+        if self.alt_key_sequence == AltKeySequenceState.ENDING_ALT_SEQUENCE:
+            self.alt_key_sequence = AltKeySequenceState.NO_SEQUENCE
+            return display, ALT_KEY_SEQUENCE_MAP.get(char, char)
+        else:
+            return display, TRANSLATE_KEYS.get(key, key)
+
+
+KEYSYMS = (list('abcXYZ0159.!?') + list(TRANSLATE_KEYS) + list(IGNORED_KEYS)
+           + ['Alt_L', '??', 'Return', 'Tab', 'F5', 'comma', 'Control_R'])
+CHARS = list(ALT_KEY_SEQUENCE_MAP) + [u'\xe9', u'x', u'', u' ']
+
+
+def random_events(rng, count):
+    events = []
+    for _ in xrange(count):
+        roll = rng.random()
+        if roll < 0.1:
+            key = 'Alt_L'
+        elif roll < 0.2:
+            key = '0'
+        elif roll < 0.3:
+            key = '??'
+        else:
+            key = rng.choice(KEYSYMS)
+        events.append((rng.choice(CHARS), key))
+    return events
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_translator_matches_reference(seed):
+    rng = random.Random(seed)
+    for _ in xrange(STREAMS):
+        reference = ReferenceTranslator()
+        compiled = aenea_client.KeyTranslator()
+        for (char, key) in random_events(rng, STREAM_LENGTH):
+            assert compiled.translate(char, key) == \
+                reference.translate(char, key), (char, key)
+
+
+def test_every_alt_sequence_character():
+    for (char, sent) in ALT_KEY_SEQUENCE_MAP.iteritems():
+        compiled = aenea_client.KeyTranslator()
+        for key in ('Alt_L', '0', '1', '??'):
+            result = compiled.translate(char, key)
+        assert result == ('??', sent)
+
+
+def test_raw_punctuation_reads_as_tk_keysyms():
+    events = list(aenea_client.read_events(
+        StringIO.StringIO(',.;()[]{}\'"'), raw=True))
+    assert [key for (char, key) in events] == [
+        'comma', 'period', 'semicolon', 'parenleft', 'parenright',
+        'bracketleft', 'bracketright', 'braceleft', 'braceright',
+        'apostrophe', 'quotedbl']
+    assert ''.join(char for (char, key) in events) == ',.;()[]{}\'"'
@@ -0,0 +1,56 @@
+"""spoken_numbers.parse must read well-formed numbers as digits() does and
+reject the word sequences SpokenNumber would otherwise let through.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'grammars'))
+
+import spoken_numbers
+
+WELL_FORMED = [
+    ('twenty five', '25'),
+    ('four two', '42'),
+    ('nineteen eighty four', '1984'),
+    ('two thousand and five', '2005'),
+    ('one hundred and five', '105'),
+    ('two million three thousand', '2003000'),
+    ('minus three point one four', '-3.14'),
+    ('thousand', '1000'),
+    ('oh seven', '07'),
+    ]
+
+MALFORMED = [
+    'and',
+    'and five',
+    'five and',
+    'one hundred and',
+    'twenty and five',
+    'one hundred and and five',
+    'one million thousand',
+    'five hundred hundred',
+    'three point',
+    'one point two point three',
+    'minus',
+    ]
+
+
+@pytest.mark.parametrize(('phrase', 'expected'), WELL_FORMED)
+def test_parse_reads_well_formed_numbers(phrase, expected):
+    words = phrase.split()
+    assert spoken_numbers.parse(words) == expected
+    assert spoken_numbers.digits(words) == expected
+
+
+@pytest.mark.parametrize('phrase', MALFORMED)
+def test_parse_rejects_malformed_numbers(phrase):
+    assert spoken_numbers.parse(phrase.split()) is None
+
+
+def test_digits_and_parse_memoize_apart():
+    assert spoken_numbers.parse(['one']) == '1'
+    assert spoken_numbers.digits(['strict', 'one']) == '?1'
+    assert spoken_numbers.digits(['one', 'and']) == '1'
+    assert spoken_numbers.parse(['one', 'and']) is None
@@ -0,0 +1,71 @@
+"""Phrases of a single insert mode entry or operator must do what they did
+before the vim rules moved to vim_core: an entry only enters insert mode,
+and an operator does nothing. Neither may be typed as an insertion.
+
+Needs dragonfly2 (for its text engine) and the aenea client package.
+"""
+import os
+import sys
+
+import pytest
+
+pytest.importorskip('dragonfly')
+pytest.importorskip('aenea.proxy_contexts')
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+import grammar_env
+
+# The baseline's output for each phrase, as (method, key or text) calls.
+BARE_PHRASES = [
+    ('inns', [('key_press', 'i')]),
+    ('syn', [('key_press', 'a')]),
+    ('phyllo', [('key_press', 'o')]),
+    ('phylum', [('key_press', 'O')]),
+    ('chaos', []),
+    ('relo', []),
+    ('three chaos', []),
+    ]
+
+
+class Recorder(object):
+
+    """Takes the place of the server behind dispatch's queue."""
+
+    def __init__(self):
+        self.calls = []
+
+    def execute_batch(self, batch):
+        for (method, args, kwargs) in batch:
+            self.calls.append(
+                (method, kwargs.get('key', kwargs.get('text'))))
+
+    def __getattr__(self, meth):
+        if meth.startswith('_'):
+            raise AttributeError(meth)
+
+        def call(*args, **kwargs):
+            self.execute_batch([(meth, args, kwargs)])
+        return call
+
+
+@pytest.fixture(scope='module')
+def vim():
+    engine = grammar_env.setup()
+    module = grammar_env.load('_vim')
+    import dispatch
+    server = dispatch.install()
+    server.flush()
+    real, server.server = server.server, Recorder()
+    yield engine, server
+    server.server = real
+    grammar_env.unload(module)
+
+
+@pytest.mark.parametrize(('phrase', 'expected'), BARE_PHRASES)
+def test_phrase_replays_as_before(vim, phrase, expected):
+    engine, server = vim
+    del server.server.calls[:]
+    engine.mimic(phrase.split())
+    server.flush()
+    assert server.server.calls == expected